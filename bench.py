@@ -0,0 +1,537 @@
+#!/usr/bin/env python3
+"""
+بنچمارک Pinterest Downloader
+============================
+همه‌چیز محلیه: یک سرور aiohttp (StubServer) عکس‌های شبیه pinimg با حجم، latency
+و نرخ خطای قابل تنظیم می‌ده، به‌علاوه صفحه پروفایل/JSON resource مصنوعی برای
+اسکرپر. هیچ درخواستی به Pinterest نمی‌ره.
+
+استفاده:
+    python bench.py harvest                          # payloadهای مصنوعی
+    python bench.py harvest resp1.json resp2.json    # payloadهای ضبط‌شده (DevTools → Save response)
+    python bench.py download --pins 10000 --latency-ms 20 --error-rate 0.01
+    python bench.py api --pins 10000
+    python bench.py boards --pins 10000 --boards 20 --latency-ms 20
+    python bench.py urls --pins 100000
+    python bench.py dom --pins 5000                  # Playwright لازمه
+    python bench.py suite --sizes 1000,10000,100000 --out bench_output.txt
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+from aiohttp import web
+
+import main
+from main import harvest_json, json_loads, sanitize
+
+
+# ══════════════════════════════════════════════════════
+#  داده مصنوعی
+# ══════════════════════════════════════════════════════
+
+SIZES = ("60x60", "136x136", "170x", "236x", "474x", "564x", "736x", "originals")
+
+def pin_path(pid: int) -> str:
+    h = f"{pid:032x}"
+    return f"{h[:2]}/{h[2:4]}/{h[4:6]}/{h}.jpg"
+
+def fake_pin(pid: int, host: str = "https://i.pinimg.com") -> dict:
+    """شبیه یک آیتم grid_item در UserActivityPinsResource (با زیرشاخه‌های پرحجم)"""
+    path = pin_path(pid)
+    return {
+        "id":          str(pid),
+        "type":        "pin",
+        "title":       f"Pin title {pid}",
+        "description": "lorem ipsum " * 8,
+        "images": {
+            s: {"width": 736, "height": 1100, "url": f"{host}/{s}/{path}"} for s in SIZES
+        },
+        "pinner": {
+            "id": str(900000 + pid % 50), "username": f"user{pid % 50}",
+            "image_medium_url": f"{host}/75x75_RS/{path}",
+        },
+        "board": {"id": str(800000 + pid % 20), "name": f"board {pid % 20}", "privacy": "public"},
+        "rich_metadata": {"site_name": "example", "article": {"authors": [{"name": "x"}] * 3}},
+        "aggregated_pin_data": {"aggregated_stats": {"saves": pid % 997, "done": 0}},
+        "reaction_counts": {"1": pid % 13},
+    }
+
+def fake_board(i: int, user: str, pins: int) -> dict:
+    return {"id": str(700000 + i), "type": "board", "name": f"Board {i}",
+            "url": f"/{user}/board-{i}/", "pin_count": pins, "privacy": "public"}
+
+def fake_payload(start: int, count: int, bookmark: str = "-end-",
+                 host: str = "https://i.pinimg.com") -> dict:
+    return {
+        "resource_response": {
+            "status": "success",
+            "data":   [fake_pin(start + i, host) for i in range(count)],
+            "bookmark": bookmark,
+        },
+        "client_context": {"analysis_ua": {"app_type": 5}, "user": {"id": "0"}},
+    }
+
+
+# ══════════════════════════════════════════════════════
+#  سرور stub (CDN + پروفایل)
+# ══════════════════════════════════════════════════════
+
+class StubServer:
+    """
+    /pinimg.com/<size>/<path>       عکس JPEG مصنوعی
+        img_kb ± 50%، latency نمایی با میانگین latency_ms،
+        error_rate → 503، missing_rate → 404 روی originals
+    /<user>/_created/               HTML با __PWS_DATA__ (batch اول + bookmark)
+    /<user>/boards/, /<user>/board-<i>/
+                                    با boards > 0: لیست بردها / batch اول هر برد؛
+                                    پین‌ها بین بردها با اندازه‌ی ∝ 1/(i+1) تقسیم می‌شن
+    /resource/<name>/get/           صفحه‌های بعدی با bookmark (BoardsResource و
+                                    BoardFeedResource هم)
+    /grid/<n>                       HTML ساده با n لینک پین (برای _dom_scan)
+    """
+
+    def __init__(self, pins: int = 1000, img_kb: int = 16, latency_ms: float = 0,
+                 error_rate: float = 0, missing_rate: float = 0, page_size: int = 25,
+                 boards: int = 0):
+        self.pins         = pins
+        self.img_kb       = img_kb
+        self.latency      = latency_ms / 1000
+        self.error_rate   = error_rate
+        self.missing_rate = missing_rate
+        self.page_size    = page_size
+        self.boards       = self._split(pins, boards)   # [(start, count)] هر برد
+        self.requests     = 0
+        self.bytes_out    = 0
+        self.base         = ""
+        self._blob        = b"\xff\xd8\xff\xe0" + os.urandom(img_kb * 1024 * 2)
+        self._runner      = None
+
+    @property
+    def cdn(self) -> str:
+        return f"{self.base}/pinimg.com"
+
+    async def __aenter__(self):
+        app = web.Application()
+        app.router.add_get("/pinimg.com/{size}/{path:.*}", self.image)
+        app.router.add_get("/resource/{name}/get/", self.resource)
+        app.router.add_get("/grid/{n}", self.grid)
+        app.router.add_get("/{user}/{section:.*}", self.profile)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.base = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc):
+        await self._runner.cleanup()
+
+    async def image(self, req):
+        self.requests += 1
+        rnd = random.Random(req.match_info["path"])
+        if self.latency:
+            await asyncio.sleep(random.expovariate(1 / self.latency))
+        if req.match_info["size"] == "originals" and rnd.random() < self.missing_rate:
+            return web.Response(status=404)
+        if random.random() < self.error_rate:
+            return web.Response(status=503)
+        size = int(self.img_kb * 1024 * rnd.uniform(0.5, 1.5))
+        body = self._blob[:size]
+        self.bytes_out += size
+        return web.Response(body=body, content_type="image/jpeg")
+
+    @staticmethod
+    def _split(pins: int, boards: int) -> list[tuple[int, int]]:
+        if not boards:
+            return []
+        w     = [1 / (i + 1) for i in range(boards)]
+        sizes = [max(1, int(pins * x / sum(w))) for x in w]
+        out, start = [], 0
+        for n in sizes:
+            out.append((start, n))
+            start += n
+        return out
+
+    def _page(self, k: int, first: int = 0, total: int | None = None) -> dict:
+        total = self.pins if total is None else total
+        start = k * self.page_size
+        count = max(0, min(self.page_size, total - start))
+        nxt   = f"bm{k + 1}" if start + count < total else "-end-"
+        return fake_payload(first + start, count, nxt, host=self.cdn)
+
+    def _boards_page(self, user: str, k: int) -> dict:
+        start = k * self.page_size
+        part  = self.boards[start:start + self.page_size]
+        nxt   = f"bm{k + 1}" if start + len(part) < len(self.boards) else "-end-"
+        return {"resource_response": {"status": "success", "bookmark": nxt, "data": [
+            fake_board(start + i, user, n) for i, (_, n) in enumerate(part)]}}
+
+    def _board_page(self, i: int, k: int) -> dict:
+        first, total = self.boards[i]
+        return self._page(k, first, total)
+
+    async def profile(self, req):
+        user, section = req.match_info["user"], req.match_info["section"].strip("/")
+        if section == "boards" and self.boards:
+            first = self._boards_page(user, 0)
+        elif section.startswith("board-") and self.boards:
+            first = self._board_page(int(section[6:]), 0)
+        else:
+            first = self._page(0)
+        data  = {"props": {"initialReduxState": {"resources": {
+            "UserActivityPinsResource": {"bench": {
+                "data": first["resource_response"]["data"],
+                "nextBookmark": first["resource_response"]["bookmark"],
+            }}}}}}
+        html = ('<html><head><title>bench</title></head><body>'
+                f'<script id="__PWS_DATA__" type="application/json">{json.dumps(data)}</script>'
+                '</body></html>')
+        resp = web.Response(text=html, content_type="text/html")
+        resp.set_cookie("csrftoken", "bench")
+        return resp
+
+    async def resource(self, req):
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        opts = json.loads(req.query["data"])["options"]
+        bm   = (opts.get("bookmarks") or [None])[0]
+        k    = int(bm[2:]) if bm and bm.startswith("bm") else 0
+        name = req.match_info["name"]
+        if name == main.API_BOARDS:
+            return web.json_response(self._boards_page(opts["username"], k))
+        if name == main.API_BOARD_FEED:
+            return web.json_response(self._board_page(int(opts["board_id"]) - 700000, k))
+        return web.json_response(self._page(k))
+
+    async def grid(self, req):
+        n = int(req.match_info["n"])
+        return web.Response(text=grid_html(0, n, self.cdn), content_type="text/html")
+
+
+def grid_html(start: int, n: int, cdn: str) -> str:
+    items = "".join(
+        f'<a href="/pin/{i}/"><img src="{cdn}/236x/{pin_path(i)}" alt="pin {i}"></a>'
+        for i in range(start, start + n)
+    )
+    return f"<html><body><div id='grid'>{items}</div></body></html>"
+
+
+# ══════════════════════════════════════════════════════
+#  نسخه قبلی (recursive) برای مقایسه
+# ══════════════════════════════════════════════════════
+
+def harvest_json_recursive(data, pins: dict):
+    if isinstance(data, list):
+        for item in data: harvest_json_recursive(item, pins)
+        return
+    if not isinstance(data, dict): return
+    pid  = str(data.get("id", ""))
+    imgs = data.get("images", {})
+    if pid and pid.isdigit() and imgs and isinstance(imgs, dict):
+        url = (
+            (imgs.get("originals") or {}).get("url") or
+            (imgs.get("736x")      or {}).get("url") or
+            (imgs.get("474x")      or {}).get("url") or
+            (imgs.get("236x")      or {}).get("url") or ""
+        )
+        if url and "pinimg.com" in url and pid not in pins:
+            pins[pid] = {
+                "pin_id": pid,
+                "url":    url,
+                "title":  sanitize(data.get("title") or data.get("description") or f"pin_{pid}"),
+            }
+            return
+    for v in data.values():
+        if isinstance(v, (dict, list)):
+            harvest_json_recursive(v, pins)
+
+
+# ══════════════════════════════════════════════════════
+#  اندازه‌گیری
+# ══════════════════════════════════════════════════════
+
+def peak_rss_mb() -> float:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return rss / (1024 * 1024) if sys.platform == "darwin" else rss / 1024
+
+def percentiles(samples: list[float]) -> dict:
+    if not samples:
+        return {}
+    xs = sorted(samples)
+    at = lambda q: xs[min(len(xs) - 1, int(len(xs) * q))]
+    return {"p50_ms": at(0.50) * 1000, "p95_ms": at(0.95) * 1000, "p99_ms": at(0.99) * 1000}
+
+def report(args, scenario: str, n: int, sec: float, latencies=(), **extra) -> dict:
+    row = {
+        "scenario": scenario, "pins": n, "sec": round(sec, 4),
+        "pins_per_s": round(n / sec, 1) if sec else None,
+        **{k: round(v, 2) for k, v in percentiles(list(latencies)).items()},
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+        **extra,
+    }
+    if args.json:
+        print(json.dumps(row, ensure_ascii=False))
+    else:
+        print("  ".join(f"{k}={v}" for k, v in row.items()))
+    if args.out:
+        with open(args.out, "a", encoding="utf-8") as f:
+            f.write(json.dumps(row, ensure_ascii=False) + "\n")
+    return row
+
+def quiet(obj):
+    """بدون progress bar و لاگ — فقط خود کار اندازه‌گیری بشه"""
+    obj.con = None
+    obj.log = lambda *a, **k: None
+    return obj
+
+
+# ══════════════════════════════════════════════════════
+#  سناریوها
+# ══════════════════════════════════════════════════════
+
+def timed(fn, texts: list[str], repeat: int) -> tuple[float, int]:
+    """بهترین زمان از repeat بار اجرا + تعداد پین"""
+    best, found = float("inf"), 0
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        found = fn(texts)
+        best = min(best, time.perf_counter() - t0)
+    return best, found
+
+def bench_harvest(args):
+    if args.payloads:
+        texts = [Path(p).read_text(encoding="utf-8") for p in args.payloads]
+    else:
+        per   = 25
+        texts = [json.dumps(fake_payload(i * per, per)) for i in range(args.pins // per)]
+    mb = sum(len(t) for t in texts) / 1e6
+
+    def before(texts):
+        pins = {}
+        for t in texts:
+            harvest_json_recursive(json.loads(t), pins)
+        return len(pins)
+
+    def after(texts):
+        pins = {}
+        for t in texts:
+            harvest_json(json_loads(t), pins)
+        return len(pins)
+
+    parser = "orjson" if main.json_loads is not json.loads else "json"
+    for name, fn in (("harvest_before", before), ("harvest_after", after)):
+        sec, n = timed(fn, texts, args.repeat)
+        report(args, name, n, sec, mb=round(mb, 1), mb_per_s=round(mb / sec, 1), parser=parser)
+
+
+def bench_urls(args):
+    """variant_urls + VariantResolver.order روی N URL"""
+    urls = [f"https://i.pinimg.com/236x/{pin_path(i)}" for i in range(args.pins)]
+    t0 = time.perf_counter()
+    for u in urls:
+        main.best_urls(u)
+    report(args, "best_urls", len(urls), time.perf_counter() - t0)
+
+    rs = main.VariantResolver()
+    t0 = time.perf_counter()
+    for u in urls:
+        for _, label, cand in rs.order(u):
+            rs.record(cand, label, label != "originals")
+    report(args, "resolver_order", len(urls), time.perf_counter() - t0)
+
+
+async def _bench_download(args):
+    async with StubServer(args.pins, args.img_kb, args.latency_ms,
+                          args.error_rate, args.missing_rate) as srv:
+        pins = [{"pin_id": str(i), "url": f"{srv.cdn}/236x/{pin_path(i)}", "title": f"pin {i}"}
+                for i in range(args.pins)]
+        latencies: list[float] = []
+
+        class TimedDownloader(main.Downloader):
+            async def _dl(self, session, pin, prog=None, tid=None):
+                t = time.perf_counter()
+                await super()._dl(session, pin, prog, tid)
+                latencies.append(time.perf_counter() - t)
+
+        with tempfile.TemporaryDirectory() as tmp:
+            t0 = time.perf_counter()
+            if args.procs > 1:
+                # latency هر پین داخل پردازه‌های فرزند می‌مونه؛ فقط throughput
+                dl = await main.run_procs(Path(tmp), pins, args.procs, concurrent=args.concurrent,
+                                          max_concurrent=args.max_concurrent)
+            else:
+                dl = quiet(TimedDownloader(Path(tmp), concurrent=args.concurrent,
+                                           max_concurrent=args.max_concurrent))
+                await dl.run(pins)
+            sec = time.perf_counter() - t0
+        report(args, "download", len(pins), sec, latencies, procs=args.procs,
+               ok=dl.ok, fail=dl.fail, retries=dl.retries, requests=srv.requests,
+               mb_per_s=round(srv.bytes_out / 1e6 / sec, 1),
+               concurrency=round(dl.limiter.limit, 1), cuts=dl.limiter.cuts)
+
+def bench_download(args):
+    asyncio.run(_bench_download(args))
+
+
+async def _bench_api(args):
+    async with StubServer(args.pins, latency_ms=args.latency_ms) as srv:
+        api = quiet(main.ApiScraper())
+        t0  = time.perf_counter()
+        pins = await api.scrape(f"{srv.base}/benchuser", "created")
+        report(args, "api_scrape", len(pins), time.perf_counter() - t0,
+               pages=-(-args.pins // srv.page_size))
+
+def bench_api(args):
+    asyncio.run(_bench_api(args))
+
+
+async def _bench_boards(args):
+    """
+    crawl همه‌ی بردها با موتور API: یکی‌یکی در برابر همزمان (بزرگ‌ترها اول).
+    largest_s زمان crawl بزرگ‌ترین برد به‌تنهاییه — کف زمان حالت همزمان.
+    """
+    async with StubServer(args.pins, latency_ms=args.latency_ms, boards=args.boards) as srv:
+        url    = f"{srv.base}/benchuser"
+        boards = await main.list_boards("api", url, metrics=main.Metrics())
+
+        async def crawl(limit: int) -> tuple[float, int, list[float]]:
+            sem, lat = asyncio.Semaphore(limit), []
+
+            async def one(board):
+                async with sem:
+                    t = time.perf_counter()
+                    pins = await quiet(main.ApiScraper()).scrape(url, "boards", board=board)
+                    lat.append(time.perf_counter() - t)
+                    return len(pins)
+
+            t0 = time.perf_counter()
+            n  = sum(await asyncio.gather(*map(one, boards)))
+            return time.perf_counter() - t0, n, lat
+
+        sec, n, lat = await crawl(1)
+        largest = max(lat)
+        report(args, "boards_serial", n, sec, lat, boards=len(boards))
+        sec, n, lat = await crawl(args.scrapes)
+        report(args, "boards_concurrent", n, sec, lat, boards=len(boards),
+               scrapes=args.scrapes, largest_s=round(largest, 3))
+
+def bench_boards(args):
+    asyncio.run(_bench_boards(args))
+
+
+async def _bench_dom(args):
+    try:
+        from playwright.async_api import async_playwright
+    except ImportError:
+        print("dom: playwright نصب نیست — رد شد", file=sys.stderr)
+        return
+    async with StubServer(args.pins) as srv, async_playwright() as p:
+        browser = await p.chromium.launch()
+        page    = await browser.new_page()
+        await page.route("**/pinimg.com/**", lambda route: route.abort())
+        await page.add_init_script(main.OBSERVER_JS)
+        await page.goto(f"{srv.base}/grid/{args.pins}")
+        scraper = quiet(main.PinterestScraper())
+        pins: dict = {}
+
+        t0 = time.perf_counter()
+        await scraper._dom_scan(page, pins, full=True)
+        report(args, "dom_full", len(pins), time.perf_counter() - t0)
+
+        # شبیه اسکرول: هر بار batch کوچیک اضافه می‌شه و فقط delta drain می‌شه
+        batch, steps, lat = 25, 40, []
+        start = args.pins
+        for _ in range(steps):
+            await page.evaluate(
+                "html => document.getElementById('grid').insertAdjacentHTML('beforeend', html)",
+                grid_html(start, batch, srv.cdn)[len("<html><body><div id='grid'>"):-len("</div></body></html>")],
+            )
+            start += batch
+            t = time.perf_counter()
+            await scraper._dom_scan(page, pins)
+            lat.append(time.perf_counter() - t)
+        report(args, "dom_delta", batch * steps, sum(lat), lat, existing=args.pins)
+        await browser.close()
+
+def bench_dom(args):
+    asyncio.run(_bench_dom(args))
+
+
+def bench_suite(args):
+    """هر سناریو × هر اندازه توی process جدا (peak RSS مستقل)"""
+    sizes = [int(x) for x in args.sizes.split(",")]
+    for scenario in args.scenarios.split(","):
+        for n in sizes:
+            cmd = [sys.executable, __file__, scenario, "--pins", str(n), "--json"]
+            if args.out:
+                cmd += ["--out", args.out]
+            if scenario == "download":
+                cmd += ["--latency-ms", str(args.latency_ms), "--error-rate", str(args.error_rate)]
+            print(f"── {scenario} × {n}", file=sys.stderr)
+            subprocess.run(cmd, check=False)
+
+
+def main_cli():
+    ap  = argparse.ArgumentParser(description="Pinterest Downloader benchmarks")
+    sub = ap.add_subparsers(dest="cmd", required=True)
+
+    def add(name, fn, help_):
+        p = sub.add_parser(name, help=help_)
+        p.add_argument("--pins", type=int, default=1000)
+        p.add_argument("--json", action="store_true", help="خروجی JSON یک خطی")
+        p.add_argument("--out",  help="نتیجه‌ها (JSONL) به این فایل اضافه بشن")
+        p.set_defaults(fn=fn)
+        return p
+
+    h = add("harvest", bench_harvest, "parse + harvest_json روی payloadهای JSON")
+    h.add_argument("payloads", nargs="*", help="فایل‌های JSON ضبط‌شده (خالی = مصنوعی)")
+    h.add_argument("--repeat", type=int, default=5)
+
+    add("urls", bench_urls, "best_urls و VariantResolver.order")
+
+    d = add("download", bench_download, "Downloader.run روی CDN محلی")
+    d.add_argument("--img-kb",       type=int,   default=16)
+    d.add_argument("--latency-ms",   type=float, default=0)
+    d.add_argument("--error-rate",   type=float, default=0)
+    d.add_argument("--missing-rate", type=float, default=0.9,
+                   help="سهم pinهایی که originals ندارن (404)")
+    d.add_argument("--concurrent",   type=int,   default=main.CONCURRENT_DL)
+    d.add_argument("--max-concurrent", type=int, default=main.AIMD_MAX)
+    d.add_argument("--procs",        type=int,   default=1, help="run_procs با N پردازه")
+
+    a = add("api", bench_api, "ApiScraper روی پروفایل مصنوعی")
+    a.add_argument("--latency-ms", type=float, default=0)
+
+    b = add("boards", bench_boards, "list_boards + crawl بردها، یکی‌یکی و همزمان")
+    b.add_argument("--boards",     type=int,   default=20)
+    b.add_argument("--scrapes",    type=int,   default=20, help="بردهای همزمان")
+    b.add_argument("--latency-ms", type=float, default=5)
+
+    add("dom", bench_dom, "_dom_scan (کامل و delta) — Playwright لازمه")
+
+    s = sub.add_parser("suite", help="همه سناریوها در چند اندازه")
+    s.add_argument("--sizes",      default="1000,10000,100000")
+    s.add_argument("--scenarios",  default="harvest,urls,download,api,dom")
+    s.add_argument("--latency-ms", type=float, default=5)
+    s.add_argument("--error-rate", type=float, default=0.01)
+    s.add_argument("--out")
+    s.set_defaults(fn=bench_suite)
+
+    args = ap.parse_args()
+    random.seed(0)
+    args.fn(args)
+
+
+if __name__ == "__main__":
+    sys.exit(main_cli())
@@ -1,574 +1,3265 @@
-#!/usr/bin/env python3
-"""
-Pinterest Profile Downloader  ⚡ v4 (stealth fixed)
-=====================================================
-نصب:
-    pip install playwright aiohttp aiofiles rich playwright-stealth
-    playwright install chromium
-
-استفاده:
-    python main.py https://www.pinterest.com/miwits
-    python main.py https://www.pinterest.com/miwits --section saved
-    python main.py https://www.pinterest.com/miwits -o ./photos -c 16
-    python main.py https://www.pinterest.com/miwits --show-browser
-    python main.py https://www.pinterest.com/miwits --save-urls
-"""
-
-import asyncio
-import aiohttp
-import aiofiles
-import argparse
-import json
-import os
-import re
-import sys
-from pathlib import Path
-from urllib.parse import urlparse
-
-try:
-    from playwright.async_api import async_playwright, TimeoutError as PWTimeout
-except ImportError:
-    print("pip install playwright && playwright install chromium")
-    sys.exit(1)
-
-# ── playwright-stealth: پشتیبانی از هر دو نسخه v1 و v2 ──────────
-HAS_STEALTH    = False
-STEALTH_V2     = False
-stealth_async  = None
-StealthClass   = None
-
-try:
-    from playwright_stealth import Stealth as StealthClass  # v2
-    HAS_STEALTH = True
-    STEALTH_V2  = True
-except ImportError:
-    pass
-
-if not HAS_STEALTH:
-    try:
-        from playwright_stealth import stealth_async          # v1
-        HAS_STEALTH = True
-        STEALTH_V2  = False
-    except ImportError:
-        pass
-
-try:
-    from rich.console import Console
-    from rich.progress import (
-        Progress, SpinnerColumn, BarColumn,
-        TextColumn, FileSizeColumn, TransferSpeedColumn, TimeRemainingColumn
-    )
-    from rich.panel import Panel
-    from rich.text import Text
-    from rich.table import Table
-    from rich import box
-    from rich.theme import Theme
-    RICH = True
-except ImportError:
-    RICH = False
-
-# ══════════════════════════════════════════════════════
-#  تنظیمات
-# ══════════════════════════════════════════════════════
-
-DARK_THEME = Theme({
-    "info": "bold cyan", "success": "bold green",
-    "warning": "bold yellow", "error": "bold red", "dim": "grey50",
-}) if RICH else None
-
-SECTIONS = {
-    "created": "_created/",
-    "saved":   "",
-    "boards":  "boards/",
-}
-
-UA = (
-    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
-    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
-)
-
-IMG_HEADERS = {
-    "User-Agent":     UA,
-    "Referer":        "https://www.pinterest.com/",
-    "Accept":         "image/webp,image/apng,image/*,*/*;q=0.8",
-    "Sec-Fetch-Dest": "image",
-    "Sec-Fetch-Mode": "no-cors",
-    "Sec-Fetch-Site": "cross-site",
-}
-
-SCROLL_PAUSE  = 2.0
-MAX_SCROLLS   = 150
-NO_CHANGE_MAX = 5
-CONCURRENT_DL = 16
-MIN_IMAGE_SIZE = 5000
-
-# JS برای مخفی کردن bot fingerprints — حتی بدون playwright-stealth
-STEALTH_JS = """
-() => {
-    // webdriver
-    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
-    // plugins
-    Object.defineProperty(navigator, 'plugins', {
-        get: () => {
-            const arr = [1,2,3,4,5];
-            arr.__proto__ = PluginArray.prototype;
-            return arr;
-        }
-    });
-    // languages
-    Object.defineProperty(navigator, 'languages', {get: () => ['en-US','en']});
-    // chrome runtime
-    if (!window.chrome) window.chrome = {};
-    if (!window.chrome.runtime) window.chrome.runtime = {};
-    // permissions
-    const origQuery = window.navigator.permissions && window.navigator.permissions.query;
-    if (origQuery) {
-        window.navigator.permissions.query = (params) =>
-            params.name === 'notifications'
-                ? Promise.resolve({state: Notification.permission})
-                : origQuery(params);
-    }
-    // iframe contentWindow
-    const iframeProto = HTMLIFrameElement.prototype;
-    const origGetter = Object.getOwnPropertyDescriptor(iframeProto, 'contentWindow');
-    if (origGetter) {
-        Object.defineProperty(iframeProto, 'contentWindow', {
-            get: function() {
-                const win = origGetter.get.call(this);
-                if (win && win.navigator) {
-                    Object.defineProperty(win.navigator, 'webdriver', {get: () => undefined});
-                }
-                return win;
-            }
-        });
-    }
-}
-"""
-
-
-# ══════════════════════════════════════════════════════
-#  ابزار
-# ══════════════════════════════════════════════════════
-
-def get_username(url: str) -> str:
-    return urlparse(url.rstrip("/")).path.strip("/").split("/")[0]
-
-def section_url(profile: str, section: str) -> str:
-    return profile.rstrip("/") + "/" + SECTIONS.get(section, "_created/")
-
-def sanitize(name: str) -> str:
-    return re.sub(r'[\\/*?:"<>|]', "_", (name or "pin").strip())[:80] or "pin"
-
-def best_urls(url: str) -> list:
-    clean = url.split('?')[0]
-    orig  = re.sub(r'/\d+x\d*/', '/originals/', clean)
-    s736  = re.sub(r'/\d+x\d*/', '/736x/',      clean)
-    s474  = re.sub(r'/\d+x\d*/', '/474x/',      clean)
-    seen, out = set(), []
-    for u in [orig, s736, s474, clean]:
-        if u and u not in seen:
-            seen.add(u); out.append(u)
-    return out
-
-def get_ext(url: str) -> str:
-    ext = os.path.splitext(urlparse(url.split('?')[0]).path)[1].lower()
-    return ext if ext in ('.jpg','.jpeg','.png','.gif','.webp') else '.jpg'
-
-def harvest_json(data, pins: dict):
-    if isinstance(data, list):
-        for item in data: harvest_json(item, pins)
-        return
-    if not isinstance(data, dict): return
-    pid  = str(data.get("id", ""))
-    imgs = data.get("images", {})
-    if pid and pid.isdigit() and imgs and isinstance(imgs, dict):
-        url = (
-            (imgs.get("originals") or {}).get("url") or
-            (imgs.get("736x")      or {}).get("url") or
-            (imgs.get("474x")      or {}).get("url") or
-            (imgs.get("236x")      or {}).get("url") or ""
-        )
-        if url and "pinimg.com" in url and pid not in pins:
-            pins[pid] = {
-                "pin_id": pid,
-                "url":    url,
-                "title":  sanitize(data.get("title") or data.get("description") or f"pin_{pid}"),
-            }
-            return
-    for v in data.values():
-        if isinstance(v, (dict, list)):
-            harvest_json(v, pins)
-
-
-# ══════════════════════════════════════════════════════
-#  اسکرپر
-# ══════════════════════════════════════════════════════
-
-class PinterestScraper:
-    def __init__(self, dark: bool = True, headless: bool = True):
-        self.dark     = dark
-        self.headless = headless
-        self.con      = Console(theme=DARK_THEME) if RICH else None
-
-    def log(self, msg, style="info"):
-        if self.con: self.con.print(f"  {msg}", style=style)
-        else: print(f"  {msg}")
-
-    async def scrape(self, profile_url: str, section: str) -> list[dict]:
-        target = section_url(profile_url, section)
-        self.log(f"🌐 [bold]{target}[/bold]")
-
-        if HAS_STEALTH:
-            ver = "v2 (Stealth class)" if STEALTH_V2 else "v1 (stealth_async)"
-            self.log(f"🛡  playwright-stealth فعال — {ver}", "success")
-        else:
-            self.log("⚠  playwright-stealth نصب نیست! → pip install playwright-stealth", "warning")
-
-        pins: dict[str, dict] = {}
-
-        async with async_playwright() as p:
-            browser = await p.chromium.launch(
-                headless=self.headless,
-                args=[
-                    "--no-sandbox",
-                    "--disable-dev-shm-usage",
-                    "--disable-blink-features=AutomationControlled",
-                    "--disable-web-security",
-                    "--lang=en-US",
-                ]
-            )
-
-            ctx = await browser.new_context(
-                user_agent=UA,
-                viewport={"width": 1920, "height": 1080},
-                locale="en-US",
-                timezone_id="America/New_York",
-                extra_http_headers={
-                    "Accept-Language": "en-US,en;q=0.9",
-                    "sec-ch-ua":          '"Chromium";v="122", "Not(A:Brand";v="24", "Google Chrome";v="122"',
-                    "sec-ch-ua-mobile":   "?0",
-                    "sec-ch-ua-platform": '"Windows"',
-                },
-            )
-
-            # stealth JS — همیشه اجرا می‌شه (حتی بدون کتابخانه)
-            await ctx.add_init_script(STEALTH_JS)
-
-            page = await ctx.new_page()
-
-            # playwright-stealth v2
-            if HAS_STEALTH and STEALTH_V2 and StealthClass:
-                try:
-                    stealth = StealthClass()
-                    await stealth.use_async(page)
-                except Exception as e:
-                    self.log(f"stealth v2 error: {e}", "warning")
-
-            # playwright-stealth v1
-            elif HAS_STEALTH and not STEALTH_V2 and stealth_async:
-                try:
-                    await stealth_async(page)
-                except Exception as e:
-                    self.log(f"stealth v1 error: {e}", "warning")
-
-            # ── رهگیری همه JSON responses ────────────────────────
-            async def on_response(resp):
-                try:
-                    if "pinimg.com" in resp.url:
-                        return
-                    ct = resp.headers.get("content-type", "")
-                    if "json" not in ct:
-                        return
-                    text = await resp.text()
-                    if '"images"' not in text:
-                        return
-                    data = json.loads(text)
-                    before = len(pins)
-                    harvest_json(data, pins)
-                    gained = len(pins) - before
-                    if gained > 0:
-                        self.log(f"   [API] +{gained}  →  جمع: [bold green]{len(pins)}[/]", "dim")
-                except Exception:
-                    pass
-
-            page.on("response", on_response)
-
-            # بلاک فقط چیزهای واقعاً سنگین — عکس‌ها بلاک نمی‌شن!
-            BLOCK_TYPES = {"font", "media", "websocket"}
-            BLOCK_KWORDS = {"doubleclick.net", "google-analytics.com", "googletagmanager.com"}
-
-            async def router(route):
-                rt  = route.request.resource_type
-                url = route.request.url
-                if rt in BLOCK_TYPES or any(b in url for b in BLOCK_KWORDS):
-                    await route.abort()
-                else:
-                    await route.continue_()
-
-            await page.route("**/*", router)
-
-            # ── بارگذاری صفحه ────────────────────────────────────
-            try:
-                self.log("⏳ بارگذاری صفحه...", "dim")
-                await page.goto(target, wait_until="networkidle", timeout=35000)
-                await asyncio.sleep(3)
-            except PWTimeout:
-                self.log("⏱ Timeout — ادامه...", "warning")
-            except Exception as e:
-                self.log(f"⚠ {e}", "warning")
-
-            title_txt = await page.title()
-            self.log(f"📄 {title_txt}", "dim")
-
-            # Dark mode
-            if self.dark:
-                try:
-                    await page.evaluate("""
-                        document.documentElement.style.filter = 'invert(1) hue-rotate(180deg)';
-                        document.querySelectorAll('img,video').forEach(
-                            el => el.style.filter = 'invert(1) hue-rotate(180deg)'
-                        );
-                    """)
-                except Exception:
-                    pass
-
-            # DOM scan قبل از اسکرول
-            await self._dom_scan(page, pins)
-
-            # ── اسکرول ───────────────────────────────────────────
-            self.log("📜 اسکرول برای بارگذاری پین‌ها...")
-            prev, no_change = 0, 0
-
-            for i in range(MAX_SCROLLS):
-                await page.evaluate(
-                    "window.scrollTo({top: document.body.scrollHeight, behavior: 'smooth'})"
-                )
-                await asyncio.sleep(SCROLL_PAUSE)
-                await self._dom_scan(page, pins)
-
-                count = len(pins)
-                self.log(f"   Scroll {i+1:03d} | Pins: [bold green]{count}[/]", "dim")
-
-                if count == prev:
-                    no_change += 1
-                    if no_change >= NO_CHANGE_MAX:
-                        self.log("✅ به انتهای صفحه رسیدیم", "success")
-                        break
-                else:
-                    no_change = 0
-                prev = count
-
-            await browser.close()
-
-        result = list(pins.values())
-        self.log(f"🔍 مجموع: [bold green]{len(result)}[/] پین یافت شد")
-        return result
-
-    async def _dom_scan(self, page, pins: dict):
-        try:
-            items = await page.evaluate("""() => {
-                const out = [];
-                const seen = new Set();
-
-                document.querySelectorAll('a[href*="/pin/"]').forEach(a => {
-                    if (seen.has(a.href)) return;
-                    const img = a.querySelector('img');
-                    if (!img) return;
-                    let src = img.src || img.currentSrc || '';
-                    if (!src && img.srcset)
-                        src = img.srcset.split(',').pop().trim().split(' ')[0];
-                    if (!src) src = img.dataset.src || img.dataset.lazySrc || '';
-                    if (src && src.includes('pinimg.com')) {
-                        seen.add(a.href);
-                        out.push({ href: a.href, src, alt: img.alt || '' });
-                    }
-                });
-
-                document.querySelectorAll('img[src*="pinimg.com"]').forEach(img => {
-                    const a = img.closest('a[href*="/pin/"]');
-                    if (!a || seen.has(a.href)) return;
-                    const src = img.src || img.currentSrc || '';
-                    if (src) { seen.add(a.href); out.push({ href: a.href, src, alt: img.alt || '' }); }
-                });
-
-                return out;
-            }""")
-
-            for item in (items or []):
-                src  = item.get("src", "")
-                href = item.get("href", "")
-                alt  = item.get("alt", "")
-                if not src or "pinimg.com" not in src:
-                    continue
-                m = re.search(r'/pin/(\d+)', href)
-                if not m:
-                    continue
-                pid = m.group(1)
-                if pid not in pins:
-                    url_736 = re.sub(r'/\d+x\d*/', '/736x/', src.split('?')[0])
-                    pins[pid] = {
-                        "pin_id": pid,
-                        "url":    url_736,
-                        "title":  sanitize(alt) or f"pin_{pid}",
-                    }
-        except Exception:
-            pass
-
-
-# ══════════════════════════════════════════════════════
-#  دانلودر async
-# ══════════════════════════════════════════════════════
-
-class Downloader:
-    def __init__(self, out: Path, concurrent: int = CONCURRENT_DL):
-        self.out = out
-        self.concurrent = concurrent
-        self.out.mkdir(parents=True, exist_ok=True)
-        self.con = Console(theme=DARK_THEME) if RICH else None
-        self.ok = self.skip = self.fail = 0
-
-    def log(self, msg, style="info"):
-        if self.con: self.con.print(f"  {msg}", style=style)
-        else: print(f"  {msg}")
-
-    async def run(self, pins: list[dict]):
-        sem  = asyncio.Semaphore(self.concurrent)
-        conn = aiohttp.TCPConnector(limit=self.concurrent, ssl=False, ttl_dns_cache=300)
-        tout = aiohttp.ClientTimeout(total=60, connect=10, sock_read=30)
-
-        async with aiohttp.ClientSession(
-            connector=conn, timeout=tout, headers=IMG_HEADERS
-        ) as session:
-            if RICH and self.con:
-                with Progress(
-                    SpinnerColumn(style="cyan"),
-                    TextColumn("[progress.description]{task.description}"),
-                    BarColumn(bar_width=35, style="cyan", complete_style="green"),
-                    TextColumn("[bold]{task.completed}/{task.total}[/]"),
-                    FileSizeColumn(),
-                    TransferSpeedColumn(),
-                    TimeRemainingColumn(),
-                    console=self.con, expand=True,
-                ) as prog:
-                    tid = prog.add_task("📥 دانلود...", total=len(pins))
-                    await asyncio.gather(*[
-                        self._dl(session, sem, pin, prog, tid) for pin in pins
-                    ])
-            else:
-                await asyncio.gather(*[self._dl(session, sem, pin) for pin in pins])
-
-    async def _dl(self, session, sem, pin, prog=None, tid=None):
-        def adv():
-            if prog: prog.advance(tid)
-
-        url   = pin.get("url", "")
-        title = pin.get("title", "pin")
-        pid   = pin.get("pin_id", "")
-
-        if not url or not url.startswith("http"):
-            self.skip += 1; adv(); return
-
-        ext   = get_ext(url)
-        fname = f"{sanitize(title)}_{pid}{ext}"
-        fpath = self.out / fname
-
-        if fpath.exists() and fpath.stat().st_size > MIN_IMAGE_SIZE:
-            self.skip += 1; adv(); return
-
-        candidates = best_urls(url)
-
-        async with sem:
-            for try_url in candidates:
-                try:
-                    async with session.get(try_url) as r:
-                        if r.status == 200:
-                            data = await r.read()
-                            if len(data) > MIN_IMAGE_SIZE:
-                                async with aiofiles.open(fpath, "wb") as f:
-                                    await f.write(data)
-                                self.ok += 1; adv(); return
-                except Exception:
-                    pass
-            self.fail += 1; adv()
-
-
-# ══════════════════════════════════════════════════════
-#  UI
-# ══════════════════════════════════════════════════════
-
-def show_banner(con):
-    if not con:
-        print("=" * 46 + "\n  Pinterest Downloader ⚡ v4\n" + "=" * 46); return
-    t = Text()
-    t.append("  ╔══════════════════════════════════╗\n", "bold magenta")
-    t.append("  ║  🖼  Pinterest Downloader  ⚡  v4 ║\n", "bold cyan")
-    t.append("  ║  دانلودر پروفایل پینترست         ║\n", "bold white")
-    t.append("  ╚══════════════════════════════════╝",   "bold magenta")
-    con.print(t); con.print()
-
-def show_summary(con, dl: Downloader):
-    if not con:
-        print(f"\nDone:{dl.ok}  Skipped:{dl.skip}  Failed:{dl.fail}  Path:{dl.out}"); return
-    t = Table(box=box.ROUNDED, style="cyan", title="📊 نتیجه دانلود")
-    t.add_column("وضعیت", style="bold")
-    t.add_column("تعداد", justify="right", style="bold")
-    t.add_row("✅ دانلود شد",   f"[green]{dl.ok}[/]")
-    t.add_row("⏭  قبلاً بود",  f"[yellow]{dl.skip}[/]")
-    t.add_row("❌ خطا",         f"[red]{dl.fail}[/]")
-    t.add_row("📁 مسیر ذخیره", f"[cyan]{dl.out}[/]")
-    con.print(t)
-
-
-# ══════════════════════════════════════════════════════
-#  main
-# ══════════════════════════════════════════════════════
-
-async def main():
-    ap = argparse.ArgumentParser(description="Pinterest Downloader v4")
-    ap.add_argument("profile_url")
-    ap.add_argument("--section",    "-s", choices=["created","saved","boards"], default="created")
-    ap.add_argument("--output",     "-o", default=None)
-    ap.add_argument("--concurrent", "-c", type=int, default=CONCURRENT_DL)
-    ap.add_argument("--no-dark",          action="store_true")
-    ap.add_argument("--show-browser",     action="store_true")
-    ap.add_argument("--save-urls",        action="store_true")
-    args = ap.parse_args()
-
-    dark = not args.no_dark
-    con  = Console(theme=DARK_THEME) if RICH else None
-    show_banner(con)
-
-    username = get_username(args.profile_url)
-    out_dir  = Path(args.output or f"pinterest_{username}_{args.section}")
-
-    if con:
-        con.print(Panel(
-            f"[cyan]Profile:[/]    [bold]{args.profile_url}[/]\n"
-            f"[cyan]Section:[/]    [bold]{args.section}[/]\n"
-            f"[cyan]Output:[/]     [bold]{out_dir}[/]\n"
-            f"[cyan]Concurrent:[/] [bold]{args.concurrent}[/]  "
-            f"[cyan]Dark:[/] [bold]{'✓' if dark else '✗'}[/]",
-            title="⚙️  Settings", border_style="magenta"
-        ))
-
-    scraper = PinterestScraper(dark=dark, headless=not args.show_browser)
-    pins    = await scraper.scrape(args.profile_url, args.section)
-
-    if not pins:
-        msg = "❌ پین پیدا نشد! با --show-browser اجرا کن تا بررسی بشه"
-        (con.print(f"[bold red]{msg}[/]") if con else print(msg))
-        return
-
-    if args.save_urls:
-        out_dir.mkdir(parents=True, exist_ok=True)
-        jp = out_dir / "pins.json"
-        json.dump(pins, open(str(jp), "w", encoding="utf-8"), ensure_ascii=False, indent=2)
-        (con.print(f"  💾 [cyan]{jp}[/]") if con else print(f"Saved: {jp}"))
-
-    dl = Downloader(out_dir, concurrent=args.concurrent)
-    await dl.run(pins)
-    show_summary(con, dl)
-
-
-if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+#!/usr/bin/env python3
+"""
+Pinterest Profile Downloader  ⚡ v4 (stealth fixed)
+=====================================================
+نصب:
+    pip install playwright aiohttp aiofiles rich playwright-stealth
+    playwright install chromium
+
+استفاده:
+    python main.py https://www.pinterest.com/miwits
+    python main.py https://www.pinterest.com/miwits --section saved
+    python main.py https://www.pinterest.com/miwits -o ./photos -c 16
+    python main.py https://www.pinterest.com/miwits --show-browser
+    python main.py https://www.pinterest.com/miwits --save-urls
+    python main.py --from-manifest pinterest_miwits_created/pins.json   # فقط دانلود، بدون Chromium
+    producer | python main.py --from-manifest - -o ./photos --plain   # JSONL از stdin
+"""
+
+import asyncio
+import aiohttp
+import aiofiles
+import argparse
+import contextlib
+import email.utils
+import hashlib
+import json
+import multiprocessing
+import os
+import queue
+import random
+import re
+import shutil
+import sqlite3
+import sys
+import threading
+import time
+from itertools import islice
+from pathlib import Path
+from urllib.parse import unquote, urlparse
+
+# parser سریع‌تر JSON اگه نصب باشه (اختیاری)
+try:
+    import orjson
+    json_loads = orjson.loads
+except ImportError:
+    json_loads = json.loads
+
+# ── importهای سنگین تنبل: حالت فقط-دانلود نه Chromium لازم داره نه rich ──
+# load_playwright() / load_rich() این‌ها رو پر می‌کنن
+async_playwright = None
+PWTimeout        = None
+HAS_STEALTH      = False
+STEALTH_V2       = False
+stealth_async    = None
+StealthClass     = None
+
+RICH       = False
+DARK_THEME = None
+
+
+class MissingDependency(RuntimeError):
+    """یک وابستگی اختیاری برای این حالت لازمه ولی نصب نیست"""
+
+
+def load_playwright():
+    """Playwright + playwright-stealth (v1 یا v2)، فقط بار اولی که موتور browser لازم بشه"""
+    global async_playwright, PWTimeout, HAS_STEALTH, STEALTH_V2, stealth_async, StealthClass
+    if async_playwright is not None:
+        return
+    try:
+        from playwright.async_api import async_playwright as ap, TimeoutError as pw_timeout
+    except ImportError:
+        raise MissingDependency("pip install playwright && playwright install chromium") from None
+    async_playwright, PWTimeout = ap, pw_timeout
+
+    try:
+        from playwright_stealth import Stealth as StealthClass  # v2
+        HAS_STEALTH = True
+        STEALTH_V2  = True
+    except ImportError:
+        pass
+
+    if not HAS_STEALTH:
+        try:
+            from playwright_stealth import stealth_async          # v1
+            HAS_STEALTH = True
+            STEALTH_V2  = False
+        except ImportError:
+            pass
+
+
+def load_rich(plain: bool = False) -> bool:
+    """rich اگه نصب باشه و --plain نخواسته باشیم؛ خروجی: RICH"""
+    global RICH, DARK_THEME, Console, Progress, SpinnerColumn, BarColumn, TextColumn
+    global FileSizeColumn, TransferSpeedColumn, TimeRemainingColumn, Panel, Text, Table, box
+    if plain or RICH:
+        return RICH
+    try:
+        from rich.console import Console
+        from rich.progress import (
+            Progress, SpinnerColumn, BarColumn,
+            TextColumn, FileSizeColumn, TransferSpeedColumn, TimeRemainingColumn
+        )
+        from rich.panel import Panel
+        from rich.text import Text
+        from rich.table import Table
+        from rich import box
+        from rich.theme import Theme
+    except ImportError:
+        return False
+    DARK_THEME = Theme({
+        "info": "bold cyan", "success": "bold green",
+        "warning": "bold yellow", "error": "bold red", "dim": "grey50",
+    })
+    RICH = True
+    return True
+
+# ══════════════════════════════════════════════════════
+#  تنظیمات
+# ══════════════════════════════════════════════════════
+
+SECTIONS = {
+    "created": "_created/",
+    "saved":   "",
+    "boards":  "boards/",
+}
+
+UA = (
+    "Mozilla/5.0 (Windows NT 10.0; Win64; x64) "
+    "AppleWebKit/537.36 (KHTML, like Gecko) Chrome/122.0.0.0 Safari/537.36"
+)
+
+IMG_HEADERS = {
+    "User-Agent":     UA,
+    "Referer":        "https://www.pinterest.com/",
+    "Accept":         "image/webp,image/apng,image/*,*/*;q=0.8",
+    "Sec-Fetch-Dest": "image",
+    "Sec-Fetch-Mode": "no-cors",
+    "Sec-Fetch-Site": "cross-site",
+}
+
+# تنظیمات ثابت هر context مرورگر (BrowserHost)
+CONTEXT_OPTS = dict(
+    user_agent=UA,
+    viewport={"width": 1920, "height": 1080},
+    locale="en-US",
+    timezone_id="America/New_York",
+    extra_http_headers={
+        "Accept-Language": "en-US,en;q=0.9",
+        "sec-ch-ua":          '"Chromium";v="122", "Not(A:Brand";v="24", "Google Chrome";v="122"',
+        "sec-ch-ua-mobile":   "?0",
+        "sec-ch-ua-platform": '"Windows"',
+    },
+)
+CONTEXT_POOL     = 2       # --serve: contextهای گرم آماده
+STATE_SAVE_EVERY = 30.0    # storage_state (کوکی‌ها) حداکثر هر چند ثانیه روی دیسک
+DAEMON_LISTEN    = "127.0.0.1"
+DAEMON_TICK      = 1.0     # فاصله‌ی رویدادهای progress در jobهای download
+
+SCROLL_PAUSE  = 2.0    # سقف اولیه انتظار بعد از هر اسکرول (زودتر رد می‌شه اگه پین برسه)
+SCROLL_MAX_WAIT = 8.0  # سقف backoff وقتی چیزی نمی‌رسه
+SCROLL_POLL   = 0.25   # فاصله drain کردن observer حین انتظار
+SCROLL_SETTLE = 0.3    # بعد از اولین پین تازه، این‌قدر برای بقیه batch صبر
+LOAD_WAIT     = 3.0    # بعد از goto تا اولین پین‌ها (قبلاً sleep ثابت)
+
+# موتور API (بدون مرورگر): resource هر section + سقف صفحه‌ها
+API_RESOURCES = {
+    "created": "UserActivityPinsResource",
+    "saved":   "UserPinsResource",
+}
+# بردها (--section boards): لیست با BoardsResource، پین‌های هر برد با BoardFeedResource
+API_BOARDS     = "BoardsResource"
+API_BOARD_FEED = "BoardFeedResource"
+BOARDS_INDEX   = "boards.json"     # فهرست بردها و پوشه‌هاشون، ریشه‌ی خروجی boards
+API_PAGE_SIZE = 25
+API_MAX_PAGES = 2000
+API_HEADERS = {
+    "User-Agent":       UA,
+    "Accept":           "application/json, text/javascript, */*; q=0.01",
+    "Accept-Language":  "en-US,en;q=0.9",
+    "X-Requested-With": "XMLHttpRequest",
+    "X-Pinterest-AppState": "active",
+}
+# سیاست منابع مرورگر (--resources): چه resource_typeهایی abort بشن.
+# لینک عکس‌ها از attributeهای img (src/srcset/data-src) و JSONها درمی‌آد،
+# پس لازم نیست Chromium خود thumbnailها رو دانلود کنه — Downloader دوباره می‌گیره.
+RESOURCE_POLICIES = {
+    "full":     frozenset(),
+    "balanced": frozenset({"image", "font", "media", "websocket"}),
+    "lean":     frozenset({"image", "font", "media", "websocket", "stylesheet",
+                           "manifest", "texttrack", "eventsource", "other"}),
+}
+RESOURCE_DEFAULT = "balanced"
+BLOCK_KWORDS = ("doubleclick.net", "google-analytics.com", "googletagmanager.com")
+
+MAX_SCROLLS   = 150
+NO_CHANGE_MAX = 5
+KNOWN_STOP    = 30     # حالت incremental: بعد از این تعداد پین تکراری پشت‌سرهم، اسکرول تمومه
+CONCURRENT_DL = 16
+MIN_IMAGE_SIZE = 5000
+CHUNK_SIZE     = 64 * 1024   # حافظه هر دانلود ≈ همین اندازه، نه کل عکس
+PART_SUFFIX    = ".part"
+MANIFEST_NAME  = ".pins.sqlite"   # وضعیت پین‌ها داخل پوشه خروجی
+MANIFEST_BATCH = 200             # هر چند نوشتن یک commit
+LAYOUTS        = ("flat", "sharded")
+SHARD_DIGITS   = 2    # sharded: زیرپوشه = دو رقم آخر pin_id (رقم‌های اول پین‌های هم‌دوره تقریباً ثابتن)
+HARVEST_OFFLOAD = 256 * 1024   # JSON بزرگ‌تر از این روی thread جدا parse می‌شه
+PIPELINE_QUEUE = 2000        # سقف صف اسکرپر → دانلودر (backpressure)
+PROC_REPORT    = 0.25        # --procs: هر پردازه هر چند ثانیه شمارنده‌هاش رو می‌فرسته
+PROC_POLL      = 0.5
+DRAIN_TIMEOUT  = 10.0        # بعد از Ctrl-C این‌قدر منتظر دانلودهای نیمه‌کاره می‌مونیم
+
+# کنترل همزمانی تطبیقی (AIMD): سالم → +1 در هر «پنجره»، 429/503/timeout → نصف
+AIMD_MAX        = 64     # سقف همزمانی (--max-concurrent)
+AIMD_MIN        = 2
+AIMD_DECREASE   = 0.5
+AIMD_COOLDOWN   = 2.0    # چند throttle پشت‌سرهم فقط یک بار نصف می‌کنن
+AIMD_LATENCY    = 3.0    # latency بیشتر از این ضریبِ بهترین → افزایش متوقف
+HOST_RATE       = 50.0   # نرخ token bucket اگه throttle قبل از اولین اندازه‌گیری نرخ برسه
+HOST_RATE_MIN   = 1.0
+HOST_RATE_MAX   = 500.0  # بالاتر از این bucket دوباره خاموش می‌شه (فقط limiter می‌مونه)
+THROTTLE_STATUS = (429, 503)
+
+# retry هر کاندید: backoff نمایی با jitter کامل؛ .part با Range ادامه پیدا می‌کنه
+RETRIES       = 3
+RETRY_BASE    = 0.5
+RETRY_MAX     = 8.0
+RETRY_STATUS  = (408, 425, 429, 500, 502, 503, 504)
+
+# resolver تطبیقی: variantی که روی یک host مدام شکست می‌خوره به ته صف می‌ره
+VARIANTS            = ("originals", "736x", "474x", "clean")
+VARIANT_MIN_SAMPLES = 20     # قبل از این تعداد تلاش، چیزی یاد گرفته نمی‌شه
+VARIANT_SKIP_RATE   = 0.05   # نرخ موفقیت کمتر از این → variant کنار گذاشته می‌شه
+VARIANT_SURE_RATE   = 0.95   # بالاتر از این (یا زیر SKIP) وضعیت variant معلومه → --probe نمی‌فرسته
+VARIANT_EXPLORE     = 50     # هر N پین یک بار ترتیب کامل امتحان می‌شه (آمار تازه بمونه)
+
+# متریک‌ها (--report / --prom): bucketهای هیستوگرام، پیشوند اسم‌ها در Prometheus
+LAT_BUCKETS   = (0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+DEPTH_BUCKETS = (0, 1, 10, 50, 100, 500, 1000, PIPELINE_QUEUE)
+METRIC_PREFIX = "pdl_"
+
+# JS برای مخفی کردن bot fingerprints — حتی بدون playwright-stealth
+STEALTH_JS = """
+() => {
+    // webdriver
+    Object.defineProperty(navigator, 'webdriver', {get: () => undefined});
+    // plugins
+    Object.defineProperty(navigator, 'plugins', {
+        get: () => {
+            const arr = [1,2,3,4,5];
+            arr.__proto__ = PluginArray.prototype;
+            return arr;
+        }
+    });
+    // languages
+    Object.defineProperty(navigator, 'languages', {get: () => ['en-US','en']});
+    // chrome runtime
+    if (!window.chrome) window.chrome = {};
+    if (!window.chrome.runtime) window.chrome.runtime = {};
+    // permissions
+    const origQuery = window.navigator.permissions && window.navigator.permissions.query;
+    if (origQuery) {
+        window.navigator.permissions.query = (params) =>
+            params.name === 'notifications'
+                ? Promise.resolve({state: Notification.permission})
+                : origQuery(params);
+    }
+    // iframe contentWindow
+    const iframeProto = HTMLIFrameElement.prototype;
+    const origGetter = Object.getOwnPropertyDescriptor(iframeProto, 'contentWindow');
+    if (origGetter) {
+        Object.defineProperty(iframeProto, 'contentWindow', {
+            get: function() {
+                const win = origGetter.get.call(this);
+                if (win && win.navigator) {
+                    Object.defineProperty(win.navigator, 'webdriver', {get: () => undefined});
+                }
+                return win;
+            }
+        });
+    }
+}
+"""
+
+# MutationObserver: فقط anchorهای پین تازه‌اضافه‌شده (یا img‌هایی که src گرفتن)
+# توی بافر جمع می‌شن؛ __pdl.drain() فقط همین delta رو برمی‌گردونه
+OBSERVER_JS = """
+(() => {
+    if (window.__pdl) return;
+    const buf = [], seen = new Set();
+    const SEL = 'a[href*="/pin/"]';
+
+    function take(a) {
+        if (!a || !a.href || seen.has(a.href)) return;
+        const img = a.querySelector('img');
+        if (!img) return;
+        let src = img.src || img.currentSrc || '';
+        if (!src && img.srcset)
+            src = img.srcset.split(',').pop().trim().split(' ')[0];
+        if (!src) src = img.dataset.src || img.dataset.lazySrc || '';
+        if (src && src.includes('pinimg.com')) {
+            seen.add(a.href);
+            buf.push({ href: a.href, src, alt: img.alt || '' });
+        }
+    }
+    function scan(node) {
+        if (!node || node.nodeType !== 1) return;
+        if (node.matches(SEL)) take(node);
+        else if (node.tagName === 'IMG') take(node.closest(SEL));
+        node.querySelectorAll(SEL).forEach(take);
+    }
+
+    new MutationObserver(muts => {
+        for (const m of muts) {
+            if (m.type === 'attributes') take(m.target.closest(SEL));
+            else m.addedNodes.forEach(scan);
+        }
+    }).observe(document, {
+        childList: true, subtree: true,
+        attributes: true, attributeFilter: ['src', 'srcset', 'data-src'],
+    });
+
+    window.__pdl = {
+        drain:  () => buf.splice(0),
+        rescan: () => scan(document.documentElement),
+    };
+})()
+"""
+
+# لینک بردهای owner توی صفحه‌ی boards/ (وقتی JSON بردها رهگیری نشه)
+BOARD_LINKS_JS = """
+(owner) => {
+    const skip = new Set(['boards', 'pins', 'followers', 'following', 'more_ideas']);
+    const out = [], seen = new Set();
+    for (const a of document.querySelectorAll('a[href]')) {
+        const parts = new URL(a.href, location.href).pathname.split('/').filter(Boolean);
+        if (parts.length !== 2 || parts[0].toLowerCase() !== owner.toLowerCase()) continue;
+        const slug = parts[1];
+        if (slug.startsWith('_') || skip.has(slug) || seen.has(slug)) continue;
+        seen.add(slug);
+        const name = a.getAttribute('aria-label') || (a.innerText || '').split('\\n')[0];
+        out.push({url: `/${parts[0]}/${slug}/`, name: (name || slug).trim()});
+    }
+    return out;
+}
+"""
+
+
+# ══════════════════════════════════════════════════════
+#  ابزار
+# ══════════════════════════════════════════════════════
+
+def get_username(url: str) -> str:
+    return urlparse(url.rstrip("/")).path.strip("/").split("/")[0]
+
+def section_url(profile: str, section: str) -> str:
+    return profile.rstrip("/") + "/" + SECTIONS.get(section, "_created/")
+
+MARKUP_RE = re.compile(r"(?<!\\)\[/?[a-z#@][^\[\]]*\]|(?<!\\)\[/\]")
+
+def plain_text(msg: str) -> str:
+    """markup rich ([bold green]…[/]) برای --plain حذف؛ rich اون موقع import نشده"""
+    return MARKUP_RE.sub("", msg).replace("\\[", "[")
+
+def sanitize(name: str) -> str:
+    return re.sub(r'[\\/*?:"<>|]', "_", (name or "pin").strip())[:80] or "pin"
+
+def variant_urls(url: str) -> list[tuple[str, str]]:
+    """[(variant, url)] به ترتیب کیفیت: originals → 736x → 474x → clean"""
+    clean = url.split('?')[0]
+    orig  = re.sub(r'/(?:\d+x\d*|originals)/', '/originals/', clean)
+    s736  = re.sub(r'/(?:\d+x\d*|originals)/', '/736x/',      clean)
+    s474  = re.sub(r'/(?:\d+x\d*|originals)/', '/474x/',      clean)
+    seen, out = set(), []
+    for label, u in zip(VARIANTS, [orig, s736, s474, clean]):
+        if u and u not in seen:
+            seen.add(u); out.append((label, u))
+    return out
+
+def best_urls(url: str) -> list:
+    return [u for _, u in variant_urls(url)]
+
+def file_size(path: Path) -> int:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return 0
+
+def fmt_bytes(n: float) -> str:
+    for unit in ("B", "KB", "MB", "GB"):
+        if n < 1024 or unit == "GB":
+            return f"{n:.0f}{unit}" if unit == "B" else f"{n:.1f}{unit}"
+        n /= 1024
+
+def get_ext(url: str) -> str:
+    ext = os.path.splitext(urlparse(url.split('?')[0]).path)[1].lower()
+    return ext if ext in ('.jpg','.jpeg','.png','.gif','.webp') else '.jpg'
+
+def hash_prefix(path: Path, h) -> bytes:
+    """محتوای فعلی .part رو وارد hash می‌کنه (برای resume)؛ خروجی: 12 بایت اول"""
+    with open(path, "rb") as f:
+        head = f.read(12)
+        h.update(head)
+        for block in iter(lambda: f.read(CHUNK_SIZE), b""):
+            h.update(block)
+    return head
+
+def known_pin_ids(out: Path) -> set[str]:
+    """
+    pin_idهایی که قبلاً توی این پوشه بودن: manifest (done) + pins.json + اسم فایل‌ها
+    """
+    known: set[str] = set()
+    if not out.is_dir():
+        return known
+    db = out / MANIFEST_NAME
+    if db.exists():
+        try:
+            con = sqlite3.connect(f"file:{db}?mode=ro", uri=True)
+            known.update(r[0] for r in con.execute("SELECT pin_id FROM pins WHERE status = 'done'"))
+            con.close()
+        except sqlite3.Error:
+            pass
+    jp = out / "pins.json"
+    if jp.exists():
+        try:
+            known.update(str(p.get("pin_id")) for p in json.loads(jp.read_text("utf-8")))
+        except (ValueError, AttributeError):
+            pass
+    known.update(scan_output(out))
+    return known
+
+PIN_FILE_RE = re.compile(r'_(\d+)\.(?:jpe?g|png|gif|webp)$')
+PIN_PART_RE = re.compile(r'_(\d+)\.(?:jpe?g|png|gif|webp)\.\w+' + re.escape(PART_SUFFIX) + '$')
+
+def shard_of(pid: str) -> str:
+    return pid[-SHARD_DIGITS:].rjust(SHARD_DIGITS, "0")
+
+def pin_relpath(fname: str, pid: str, layout: str) -> str:
+    return f"{shard_of(pid)}/{fname}" if layout == "sharded" else fname
+
+def iter_output(out: Path):
+    """
+    اسم فایل‌های پوشه خروجی و زیرپوشه‌های shard (یک سطح)، بدون stat —
+    d_type خود scandir برای تشخیص پوشه کافیه. خروجی: مسیرهای نسبی
+    """
+    if not out.is_dir():
+        return
+    with os.scandir(out) as it:
+        subdirs = []
+        for e in it:
+            if e.is_dir(follow_symlinks=False):
+                if len(e.name) == SHARD_DIGITS and e.name.isdigit():
+                    subdirs.append(e.name)
+            else:
+                yield e.name
+    for d in subdirs:
+        with os.scandir(out / d) as it:
+            for e in it:
+                if not e.is_dir(follow_symlinks=False):
+                    yield f"{d}/{e.name}"
+
+def scan_output(out: Path, parts: set[str] | None = None) -> dict[str, str]:
+    """
+    یک پیمایش برای کل اجرا: pin_id → مسیر نسبی فایل موجود (به‌جای exists/stat برای هر پین).
+    parts: اگه داده بشه مسیر نسبی .partهای نیمه‌کاره هم توش جمع می‌شه.
+    """
+    index: dict[str, str] = {}
+    for rel in iter_output(out):
+        m = PIN_FILE_RE.search(rel)
+        if m: index.setdefault(m.group(1), rel)
+        elif parts is not None and PIN_PART_RE.search(rel): parts.add(rel)
+    return index
+
+def pin_record(obj) -> dict | None:
+    """یک آیتم pins.json / خط JSONL → پین قابل دانلود؛ بدون pin_id یا url → None"""
+    if not isinstance(obj, dict):
+        return None
+    pid = str(obj.get("pin_id") or obj.get("id") or "")
+    url = obj.get("url") or ""
+    if not pid.isdigit() or not isinstance(url, str) or not url:
+        return None
+    return {"pin_id": pid, "url": url, "title": obj.get("title") or f"pin_{pid}"}
+
+def parse_pins(lines) -> tuple[list[dict], int]:
+    """
+    pins.json (آرایه JSON، خروجی --save-urls) یا JSONL (هر خط یک پین).
+    خروجی: (پین‌ها, تعداد آیتم‌های نامعتبر)
+    """
+    pins, bad, it = [], 0, iter(lines)
+    for line in it:
+        if not line.strip():
+            continue
+        if line.lstrip().startswith("["):
+            try:
+                items = json_loads(line + "".join(it))
+            except ValueError:
+                return pins, bad + 1
+            items = items if isinstance(items, list) else [items]
+        else:
+            try:
+                items = [json_loads(line)]
+            except ValueError:
+                items = [None]
+        for obj in items:
+            pin = pin_record(obj)
+            if pin: pins.append(pin)
+            else:   bad += 1
+    return pins, bad
+
+def pws_json(html: str):
+    """JSON جاسازی‌شده‌ی صفحه (__PWS_INITIAL_PROPS__ / __PWS_DATA__) یا None"""
+    m = re.search(
+        r'<script[^>]*id="__PWS_(?:INITIAL_PROPS|DATA)__"[^>]*>(.*?)</script>', html, re.S
+    )
+    if not m:
+        return None
+    try:
+        return json.loads(m.group(1))
+    except ValueError:
+        return None
+
+def find_bookmark(data) -> str | None:
+    """اولین nextBookmark/bookmark معتبر داخل JSON تو در تو"""
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if isinstance(node, dict):
+            for key in ("nextBookmark", "bookmark"):
+                bm = node.get(key)
+                if isinstance(bm, str) and bm and bm != "-end-":
+                    return bm
+            stack.extend(v for v in node.values() if isinstance(v, (dict, list)))
+        elif isinstance(node, list):
+            stack.extend(v for v in node if isinstance(v, (dict, list)))
+    return None
+
+def looks_like_image(head: bytes) -> bool:
+    """امضای چند بایت اول فایل: JPEG / PNG / GIF / WEBP"""
+    return (
+        head[:3] == b"\xff\xd8\xff" or
+        head[:8] == b"\x89PNG\r\n\x1a\n" or
+        head[:4] == b"GIF8" or
+        (head[:4] == b"RIFF" and head[8:12] == b"WEBP")
+    )
+
+IMAGE_KEYS = ("originals", "736x", "474x", "236x")
+
+def harvest_json(data, pins: dict):
+    """
+    پیمایش iterative با stack (بدون محدودیت عمق recursion) به همون ترتیب سند.
+    dictی که id عددی و images با URL pinimg داره پینه و زیرشاخه‌هاش بررسی نمی‌شن.
+    """
+    stack = [data]
+    pop, push = stack.pop, stack.append
+    while stack:
+        node = pop()
+        if type(node) is list:
+            for v in reversed(node):
+                if type(v) is dict or type(v) is list:
+                    push(v)
+            continue
+        if type(node) is not dict:
+            continue
+        imgs = node.get("images")
+        if imgs and type(imgs) is dict:
+            pid = str(node.get("id", ""))
+            if pid.isdigit():
+                url = ""
+                for key in IMAGE_KEYS:
+                    v = imgs.get(key)
+                    if type(v) is dict and (url := v.get("url")):
+                        break
+                if url and "pinimg.com" in url and pid not in pins:
+                    pins[pid] = {
+                        "pin_id": pid,
+                        "url":    url,
+                        "title":  sanitize(node.get("title") or node.get("description") or f"pin_{pid}"),
+                    }
+                    continue
+        for v in reversed(list(node.values())):
+            if type(v) is dict or type(v) is list:
+                push(v)
+
+def harvest_boards(data, boards: dict, owner: str):
+    """
+    dictهای type=board با url /<owner>/<slug>/ → boards[url] = {id, name, url, pin_count}.
+    بردهای کاربرهای دیگه (مثلاً board پین‌های repin‌شده) رد می‌شن.
+    رکوردی که از DOM اومده و id نداره با نسخه‌ی JSON جایگزین می‌شه.
+    """
+    owner = owner.lower()
+    stack = [data]
+    while stack:
+        node = stack.pop()
+        if type(node) is list:
+            stack.extend(v for v in reversed(node) if type(v) is dict or type(v) is list)
+            continue
+        if type(node) is not dict:
+            continue
+        if node.get("type") == "board":
+            bid   = str(node.get("id", ""))
+            url   = node.get("url") or ""
+            parts = url.strip("/").split("/")
+            if bid.isdigit() and len(parts) == 2 and parts[0].lower() == owner:
+                cur = boards.get(url)
+                if cur is None or not cur["id"]:
+                    boards[url] = {
+                        "id":        bid,
+                        "name":      node.get("name") or parts[1],
+                        "url":       url,
+                        "pin_count": int(node.get("pin_count") or 0),
+                    }
+                continue
+        stack.extend(v for v in reversed(list(node.values())) if type(v) is dict or type(v) is list)
+
+def board_dir(board: dict) -> str:
+    """اسم زیرپوشه‌ی هر برد: slug آدرسش (بین بردهای یک کاربر یکتاست)"""
+    return sanitize(unquote(board["url"].strip("/").split("/")[-1]))
+
+def parse_harvest(text: str) -> tuple[object, dict]:
+    data  = json_loads(text)
+    found: dict[str, dict] = {}
+    if type(data) is dict or type(data) is list:
+        harvest_json(data, found)
+    return data, found
+
+async def harvest_text(text: str, pins: dict):
+    """
+    متن JSON → pins. payloadهای بزرگ‌تر از HARVEST_OFFLOAD روی thread جدا
+    parse و پیمایش می‌شن تا event loop (مرورگر/دانلود) گیر نکنه.
+    خروجی: JSON parse‌شده
+    """
+    if len(text) >= HARVEST_OFFLOAD:
+        data, found = await asyncio.to_thread(parse_harvest, text)
+    else:
+        data, found = parse_harvest(text)
+    for pid, pin in found.items():
+        if pid not in pins:
+            pins[pid] = pin
+    return data
+
+
+# ══════════════════════════════════════════════════════
+#  متریک‌ها
+# ══════════════════════════════════════════════════════
+
+class Histogram:
+    """bucketهای ثابت (مثل Prometheus)؛ حافظه به تعداد نمونه‌ها بستگی نداره"""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: tuple = LAT_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)     # آخری = +Inf
+        self.sum    = 0.0
+        self.count  = 0
+
+    def observe(self, v: float):
+        i = 0
+        while i < len(self.bounds) and v > self.bounds[i]:
+            i += 1
+        self.counts[i] += 1
+        self.sum   += v
+        self.count += 1
+
+    def quantile(self, q: float) -> float | None:
+        """تخمین از روی bucketها (کران بالای bucketی که q توشه)"""
+        if not self.count:
+            return None
+        rank, acc = q * self.count, 0
+        for i, c in enumerate(self.counts):
+            acc += c
+            if acc >= rank:
+                return self.bounds[i] if i < len(self.bounds) else float("inf")
+        return float("inf")
+
+
+class Metrics:
+    """
+    شمارنده‌ها، تایمر فازها، هیستوگرام‌ها و gaugeها برای یک اجرا (یا کل batch).
+    اسکرپرها و Downloader همه روی یک نمونه می‌نویسن؛ آخر کار به JSON
+    (--report) یا textfile پرومتئوس (--prom) تبدیل می‌شه.
+    زمان فازها تجمعیه: فازهای همزمان (مثلاً harvest حین scroll) هم‌پوشانی دارن.
+    """
+
+    def __init__(self):
+        self.started  = time.time()
+        self.phases:   dict[str, float] = {}
+        self.counters: dict[tuple, float] = {}
+        self.gauges:   dict[tuple, float] = {}
+        self.hists:    dict[tuple, Histogram] = {}
+
+    @staticmethod
+    def _key(name: str, labels: dict) -> tuple:
+        return (name, tuple(sorted((k, str(v)) for k, v in labels.items())))
+
+    @contextlib.contextmanager
+    def phase(self, name: str):
+        t0 = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_phase(name, time.perf_counter() - t0)
+
+    def add_phase(self, name: str, sec: float):
+        self.phases[name] = self.phases.get(name, 0.0) + sec
+
+    def add(self, name: str, n: float = 1, **labels):
+        k = self._key(name, labels)
+        self.counters[k] = self.counters.get(k, 0) + n
+
+    def total(self, name: str, **labels) -> float:
+        """جمع شمارنده‌ی name روی همه‌ی ردیف‌هایی که labels رو دارن"""
+        want = {(k, str(v)) for k, v in labels.items()}
+        return sum(v for (n, lb), v in self.counters.items() if n == name and want <= set(lb))
+
+    def gauge(self, name: str, value: float, **labels):
+        self.gauges[self._key(name, labels)] = value
+
+    def observe(self, name: str, value: float, bounds: tuple = LAT_BUCKETS, **labels):
+        k = self._key(name, labels)
+        h = self.hists.get(k)
+        if h is None:
+            h = self.hists[k] = Histogram(bounds)
+        h.observe(value)
+
+    def merge(self, other: "Metrics"):
+        """
+        متریک‌های یک پردازه‌ی دیگه (--procs) روی همین جمع می‌شن.
+        gaugeها هم جمع می‌شن (تنها gaugeها همزمانی‌ان، که جمعشون معنی داره).
+        """
+        for k, v in other.phases.items():
+            self.add_phase(k, v)
+        for k, v in other.counters.items():
+            self.counters[k] = self.counters.get(k, 0) + v
+        for k, v in other.gauges.items():
+            self.gauges[k] = self.gauges.get(k, 0) + v
+        for k, h in other.hists.items():
+            mine = self.hists.get(k)
+            if mine is None:
+                self.hists[k] = h
+                continue
+            mine.counts = [a + b for a, b in zip(mine.counts, h.counts)]
+            mine.sum   += h.sum
+            mine.count += h.count
+
+    def report(self, **extra) -> dict:
+        def flat(store: dict) -> list[dict]:
+            return [{"name": n, "labels": dict(lb), "value": v} for (n, lb), v in sorted(store.items())]
+        return {
+            "started":    self.started,
+            "duration_s": round(time.time() - self.started, 3),
+            "phases_s":   {k: round(v, 3) for k, v in sorted(self.phases.items())},
+            "counters":   flat(self.counters),
+            "gauges":     flat(self.gauges),
+            "histograms": [{
+                "name": n, "labels": dict(lb), "count": h.count, "sum": round(h.sum, 4),
+                "p50": h.quantile(0.5), "p95": h.quantile(0.95), "p99": h.quantile(0.99),
+                "buckets": dict(zip([str(b) for b in h.bounds] + ["+Inf"], h.counts)),
+            } for (n, lb), h in sorted(self.hists.items())],
+            **extra,
+        }
+
+    def prometheus(self) -> str:
+        """فرمت متنی exposition؛ برای textfile collector خود node_exporter"""
+        out: list[str] = []
+        typed: set[str] = set()
+
+        def fmt(lb) -> str:
+            if not lb:
+                return ""
+            esc = lambda v: v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+            return "{" + ",".join(f'{k}="{esc(v)}"' for k, v in lb) + "}"
+
+        def line(name, kind, lb, value):
+            name = METRIC_PREFIX + name
+            if name not in typed:
+                typed.add(name)
+                out.append(f"# TYPE {name} {kind}")
+            out.append(f"{name}{fmt(lb)} {value}")
+
+        line("run_started_seconds", "gauge", (), self.started)
+        line("run_duration_seconds", "gauge", (), round(time.time() - self.started, 3))
+        for ph, sec in sorted(self.phases.items()):
+            line("phase_seconds", "gauge", (("phase", ph),), round(sec, 4))
+        for (n, lb), v in sorted(self.counters.items()):
+            line(f"{n}_total", "counter", lb, v)
+        for (n, lb), v in sorted(self.gauges.items()):
+            line(n, "gauge", lb, v)
+        for (n, lb), h in sorted(self.hists.items()):
+            name = METRIC_PREFIX + n
+            if name not in typed:
+                typed.add(name)
+                out.append(f"# TYPE {name} histogram")
+            acc = 0
+            for b, c in zip(list(h.bounds) + ["+Inf"], h.counts):
+                acc += c
+                out.append(f"{name}_bucket{fmt(lb + (('le', str(b)),))} {acc}")
+            out.append(f"{name}_sum{fmt(lb)} {round(h.sum, 6)}")
+            out.append(f"{name}_count{fmt(lb)} {h.count}")
+        return "\n".join(out) + "\n"
+
+    @staticmethod
+    def write(path: Path, text: str):
+        """نوشتن اتمیک (tmp + replace) تا collector هیچ‌وقت فایل نصفه نخونه"""
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp = path.with_name(f".{path.name}.tmp")
+        tmp.write_text(text, encoding="utf-8")
+        os.replace(tmp, path)
+
+
+# ══════════════════════════════════════════════════════
+#  اسکرپر
+# ══════════════════════════════════════════════════════
+
+async def launch_browser(p, headless: bool = True):
+    return await p.chromium.launch(
+        headless=headless,
+        args=[
+            "--no-sandbox",
+            "--disable-dev-shm-usage",
+            "--disable-blink-features=AutomationControlled",
+            "--disable-web-security",
+            "--lang=en-US",
+        ]
+    )
+
+
+class BrowserHost:
+    """
+    یک Chromium مشترک برای چند scrape همزمان (batch و --serve).
+    contextها از قبل تنظیم‌شده‌ان (UA، هدرها، STEALTH_JS، OBSERVER_JS) و بعد از
+    هر کار تا pool_size تا به pool برمی‌گردن تا cookie و cache گرم بمونن.
+    با state_path کوکی‌ها (storage_state) بین اجراها هم می‌مونن.
+    shared=True: همه‌ی scrapeها صفحه‌های یک context واحدن (crawl همزمان بردها).
+    اولین get() مرورگر رو بالا می‌آره؛ اگه هیچ کاری مرورگر نخواد اصلاً بالا نمی‌آد.
+    """
+
+    def __init__(self, headless: bool = True, pool_size: int = 0, state_path: Path | None = None,
+                 shared: bool = False):
+        self.headless   = headless
+        self.pool_size  = pool_size
+        self.state_path = state_path
+        self.shared     = shared
+        self.browser    = None
+        self.idle: list = []
+        self._pw        = None
+        self._lock      = asyncio.Lock()
+        self._ctx_lock  = asyncio.Lock()
+        self._saved     = 0.0
+
+    async def get(self):
+        async with self._lock:
+            if self.browser is None:
+                load_playwright()
+                self._pw     = await async_playwright().start()
+                self.browser = await launch_browser(self._pw, self.headless)
+        return self.browser
+
+    async def _new_context(self):
+        browser = await self.get()
+        state   = self.state_path if self.state_path and self.state_path.exists() else None
+        ctx = await browser.new_context(storage_state=str(state) if state else None, **CONTEXT_OPTS)
+        # stealth JS — همیشه اجرا می‌شه (حتی بدون کتابخانه)
+        await ctx.add_init_script(STEALTH_JS)
+        await ctx.add_init_script(OBSERVER_JS)
+        return ctx
+
+    async def warm(self, n: int | None = None):
+        """contextهای خالی از قبل، تا کار بعدی فقط منتظر بارگذاری صفحه باشه"""
+        n = self.pool_size if n is None else n
+        while len(self.idle) < n:
+            self.idle.append(await self._new_context())
+
+    @contextlib.asynccontextmanager
+    async def context(self):
+        if self.shared:
+            # context مشترک توی idle می‌مونه تا close() ذخیره و بسته‌ش کنه
+            async with self._ctx_lock:
+                if not self.idle:
+                    self.idle.append(await self._new_context())
+            yield self.idle[0]
+            return
+        ctx = self.idle.pop() if self.idle else await self._new_context()
+        ok  = False
+        try:
+            yield ctx
+            ok = True
+        finally:
+            await self._release(ctx, ok)
+
+    async def _release(self, ctx, ok: bool):
+        """context سالم به pool برمی‌گرده (صفحه‌هاش بسته می‌شن)؛ بعد از خطا دور انداخته می‌شه"""
+        try:
+            if ok:
+                await self.save_state(ctx)
+            if ok and len(self.idle) < self.pool_size:
+                for page in ctx.pages:
+                    await page.close()
+                self.idle.append(ctx)
+                return
+        except Exception:
+            pass
+        with contextlib.suppress(Exception):
+            await ctx.close()
+
+    async def save_state(self, ctx, force: bool = False):
+        if not self.state_path:
+            return
+        now = time.monotonic()
+        if not force and now - self._saved < STATE_SAVE_EVERY:
+            return
+        self._saved = now
+        tmp = self.state_path.with_name(self.state_path.name + ".tmp")
+        await ctx.storage_state(path=str(tmp))
+        os.replace(tmp, self.state_path)
+
+    async def close(self):
+        if self.idle and self.browser is not None:
+            with contextlib.suppress(Exception):
+                await self.save_state(self.idle[-1], force=True)
+        for ctx in self.idle:
+            with contextlib.suppress(Exception):
+                await ctx.close()
+        self.idle = []
+        if self.browser is not None:
+            await self.browser.close()
+            self.browser = None
+        if self._pw is not None:
+            await self._pw.stop()
+            self._pw = None
+
+
+class BaseScraper:
+    """بخش مشترک موتورها: لاگ، صف pipeline، توقف incremental، متریک‌ها"""
+
+    def __init__(self, metrics: Metrics | None = None):
+        self.con      = Console(theme=DARK_THEME) if RICH else None
+        self.metrics  = metrics or Metrics()
+        self.queue: asyncio.Queue | None = None
+        self._emitted = 0
+        self.known: set[str] = set()
+        self.skip_ids: set[str] = set()
+        self.stop_after_known = 0
+        self._known_streak = 0
+        self._activity = asyncio.Event()
+
+    def log(self, msg, style="info"):
+        if self.con: self.con.print(f"  {msg}", style=style)
+        else: print(f"  {plain_text(msg)}")
+
+    def _reset(self, queue, known, stop_after_known, skip_ids):
+        self.queue, self._emitted = queue, 0
+        self.known, self.stop_after_known = known or set(), stop_after_known
+        self.skip_ids = skip_ids or set()
+        self._known_streak = 0
+
+    async def _publish(self, pins: dict):
+        """
+        پین‌های تازه (بعد از آخرین publish): شمارش پین‌های تکراری پشت‌سرهم
+        برای حالت incremental + گذاشتن توی صف pipeline.
+        skip_ids: پین‌هایی که موتور قبلی همین اجرا قبلاً فرستاده.
+        _emitted مکان‌نمای publish‌ه: pins فقط append می‌شه، پس تازه‌ها از ته
+        dict خونده می‌شن — هزینه‌ی هر batch به اندازه‌ی خودش، نه کل پین‌ها.
+        """
+        new = len(pins) - self._emitted
+        if new <= 0:
+            return
+        fresh = list(islice(reversed(pins.values()), new))[::-1]
+        self._emitted = len(pins)
+        self._activity.set()
+        self.metrics.add("pins_found", len(fresh))
+        for pin in fresh:
+            if pin["pin_id"] in self.known:
+                self._known_streak += 1
+            else:
+                self._known_streak = 0
+            if self.queue is not None and pin["pin_id"] not in self.skip_ids:
+                await self.queue.put(pin)
+
+    @property
+    def reached_known(self) -> bool:
+        return self.stop_after_known > 0 and self._known_streak >= self.stop_after_known
+
+
+class ApiScraper(BaseScraper):
+    """
+    موتور بدون مرورگر: HTML پروفایل یک بار (cookie + CSRF + batch اول از
+    __PWS_DATA__)، بعد صفحه‌به‌صفحه با bookmark روی resource API.
+    host از خود profile_url می‌آد، پس روی سرور stub محلی هم کار می‌کنه.
+    """
+
+    def __init__(self, metrics: Metrics | None = None):
+        super().__init__(metrics)
+        self.complete = False   # True یعنی pagination تا -end- رسید
+
+    @staticmethod
+    def _session(jar) -> aiohttp.ClientSession:
+        conn = aiohttp.TCPConnector(limit=4, ttl_dns_cache=300)
+        tout = aiohttp.ClientTimeout(total=30, connect=10)
+        return aiohttp.ClientSession(connector=conn, timeout=tout, headers=API_HEADERS, cookie_jar=jar)
+
+    async def _get(self, session, url: str, phase: str, **kw) -> str:
+        m = self.metrics
+        with m.phase(phase):
+            t0 = time.perf_counter()
+            async with session.get(url, **kw) as r:
+                m.observe("api_request_seconds", time.perf_counter() - t0, status=r.status)
+                r.raise_for_status()
+                text = await r.text()
+        m.add("api_bytes", len(text))
+        return text
+
+    @staticmethod
+    def _params(source: str, options: dict, bookmark: str | None) -> dict:
+        options = {**options, "page_size": API_PAGE_SIZE}
+        if bookmark:
+            options["bookmarks"] = [bookmark]
+        return {
+            "source_url": source,
+            "data": json.dumps({"options": options, "context": {}}, separators=(",", ":")),
+        }
+
+    async def scrape(self, profile_url: str, section: str,
+                     queue: asyncio.Queue | None = None,
+                     known: set[str] | None = None,
+                     stop_after_known: int = 0,
+                     skip_ids: set[str] | None = None,
+                     board: dict | None = None) -> list[dict]:
+        """board: یک برد از boards() → پین‌های همون برد با BoardFeedResource"""
+        self._reset(queue, known, stop_after_known, skip_ids)
+        self.complete = False
+        resource = API_BOARD_FEED if board else API_RESOURCES.get(section)
+        if not resource:
+            raise ValueError(f"section '{section}' با موتور API پشتیبانی نمی‌شه")
+
+        pu       = urlparse(profile_url)
+        base     = f"{pu.scheme}://{pu.netloc}"
+        username = get_username(profile_url)
+        if board:
+            target = base + board["url"]
+            scope  = {"board_id": board["id"], "board_url": board["url"]}
+        else:
+            target = section_url(f"{base}/{username}", section)
+            scope  = {"username": username}
+        source   = urlparse(target).path
+        self.log(f"🌐 [bold]{target}[/bold] [dim](API)[/]")
+
+        pins: dict[str, dict] = {}
+        m    = self.metrics
+        jar  = aiohttp.CookieJar(unsafe=True)
+
+        async with self._session(jar) as session:
+            html = await self._get(session, target, "page_load", headers={"Accept": "text/html"})
+
+            data = pws_json(html)
+            if data is not None:
+                with m.phase("harvest"):
+                    harvest_json(data, pins)
+                await self._publish(pins)
+            self.log(f"   [HTML] {len(pins)} پین", "dim")
+
+            csrf = next((c.value for c in jar if c.key == "csrftoken"), "")
+            bookmark = find_bookmark(data) if data is not None else None
+            headers  = {"Referer": target, "X-CSRFToken": csrf}
+            no_change = 0
+
+            for page_no in range(API_MAX_PAGES):
+                if self.reached_known:
+                    self.log(f"✅ به {self._known_streak} پین قبلی رسیدیم — توقف incremental", "success")
+                    break
+                params = self._params(source, {**scope, "field_set_key": "grid_item"}, bookmark)
+                text   = await self._get(session, f"{base}/resource/{resource}/get/", "api_pages",
+                                         params=params, headers=headers)
+
+                before  = len(pins)
+                with m.phase("harvest"):
+                    payload = await harvest_text(text, pins)
+                await self._publish(pins)
+                gained = len(pins) - before
+                self.log(f"   [API] page {page_no + 1:03d} +{gained}  →  جمع: [bold green]{len(pins)}[/]", "dim")
+
+                resp_obj = payload.get("resource_response") if isinstance(payload, dict) else None
+                bookmark = (resp_obj or {}).get("bookmark")
+                if not bookmark or bookmark == "-end-":
+                    self.complete = True
+                    break
+                no_change = no_change + 1 if gained == 0 else 0
+                if no_change >= NO_CHANGE_MAX:
+                    self.complete = True
+                    break
+
+        result = list(pins.values())
+        self.log(f"🔍 مجموع: [bold green]{len(result)}[/] پین یافت شد")
+        return result
+
+    async def boards(self, profile_url: str) -> list[dict]:
+        """همه‌ی بردهای کاربر: batch اول از HTML صفحه‌ی boards/، بقیه با BoardsResource"""
+        pu       = urlparse(profile_url)
+        base     = f"{pu.scheme}://{pu.netloc}"
+        username = get_username(profile_url)
+        target   = section_url(f"{base}/{username}", "boards")
+        source   = urlparse(target).path
+        self.log(f"🌐 [bold]{target}[/bold] [dim](API)[/]")
+
+        boards: dict[str, dict] = {}
+        jar = aiohttp.CookieJar(unsafe=True)
+        async with self._session(jar) as session:
+            html = await self._get(session, target, "page_load", headers={"Accept": "text/html"})
+            data = pws_json(html)
+            if data is not None:
+                harvest_boards(data, boards, username)
+
+            csrf = next((c.value for c in jar if c.key == "csrftoken"), "")
+            bookmark = find_bookmark(data) if data is not None else None
+            headers  = {"Referer": target, "X-CSRFToken": csrf}
+            options  = {"username": username, "privacy_filter": "all", "sort": "custom",
+                        "field_set_key": "profile_grid_item"}
+
+            for _ in range(API_MAX_PAGES):
+                text = await self._get(session, f"{base}/resource/{API_BOARDS}/get/", "api_pages",
+                                       params=self._params(source, options, bookmark), headers=headers)
+                payload = json_loads(text)
+                before  = len(boards)
+                harvest_boards(payload, boards, username)
+                resp_obj = payload.get("resource_response") if isinstance(payload, dict) else None
+                bookmark = (resp_obj or {}).get("bookmark")
+                if not bookmark or bookmark == "-end-" or len(boards) == before:
+                    break
+
+        self.log(f"📚 {len(boards)} برد")
+        return list(boards.values())
+
+
+class PinterestScraper(BaseScraper):
+    def __init__(self, dark: bool = True, headless: bool = True, metrics: Metrics | None = None,
+                 resources: str = RESOURCE_DEFAULT):
+        super().__init__(metrics)
+        self.dark      = dark
+        self.headless  = headless
+        self.resources = resources
+        self.block     = RESOURCE_POLICIES[resources]
+        self.scroll_times: list[float] = []
+        self.traffic: dict[str, list[int]] = {}   # resource_type → [bytes, requests, blocked]
+
+    async def scrape(self, profile_url: str, section: str,
+                     queue: asyncio.Queue | None = None,
+                     known: set[str] | None = None,
+                     stop_after_known: int = 0,
+                     skip_ids: set[str] | None = None,
+                     host: BrowserHost | None = None,
+                     board: dict | None = None) -> list[dict]:
+        """
+        اگه queue داده بشه هر پین جدید همون لحظه توی صف می‌ره تا
+        Downloader.consume همزمان با اسکرول دانلود کنه.
+        known + stop_after_known: بعد از stop_after_known پین آشنای پشت‌سرهم
+        اسکرول متوقف می‌شه (sync ساعتی پروفایل‌های بزرگ).
+        host: مرورگر مشترک (batch / --serve) که context گرم می‌ده؛
+        نبود → یک BrowserHost موقت همین‌جا بالا می‌آد و بسته می‌شه.
+        board: یک برد از boards() → صفحه‌ی همون برد اسکرول می‌شه.
+        """
+        load_playwright()
+        self._reset(queue, known, stop_after_known, skip_ids)
+        self.scroll_times = []
+        self.traffic = {}
+        if board:
+            pu     = urlparse(profile_url)
+            target = f"{pu.scheme}://{pu.netloc}{board['url']}"
+        else:
+            target = section_url(profile_url, section)
+        self.log(f"🌐 [bold]{target}[/bold]")
+
+        if HAS_STEALTH:
+            ver = "v2 (Stealth class)" if STEALTH_V2 else "v1 (stealth_async)"
+            self.log(f"🛡  playwright-stealth فعال — {ver}", "success")
+        else:
+            self.log("⚠  playwright-stealth نصب نیست! → pip install playwright-stealth", "warning")
+
+        pins: dict[str, dict] = {}
+
+        own  = host is None
+        host = host or BrowserHost(self.headless)
+        try:
+            with self.metrics.phase("browser_launch"):
+                await host.get()
+            async with host.context() as ctx:
+                await self._scrape_in(ctx, target, pins)
+        finally:
+            if own:
+                await host.close()
+
+        self._log_scroll_stats()
+        self._log_traffic()
+        result = list(pins.values())
+        self.log(f"🔍 مجموع: [bold green]{len(result)}[/] پین یافت شد")
+        return result
+
+    async def boards(self, profile_url: str, host: BrowserHost | None = None) -> list[dict]:
+        """بردهای کاربر از صفحه‌ی boards/: JSONهای رهگیری‌شده به‌علاوه لینک‌های DOM"""
+        load_playwright()
+        owner  = get_username(profile_url)
+        target = section_url(profile_url, "boards")
+        self.log(f"🌐 [bold]{target}[/bold]")
+        boards: dict[str, dict] = {}
+
+        own  = host is None
+        host = host or BrowserHost(self.headless)
+        try:
+            with self.metrics.phase("browser_launch"):
+                await host.get()
+            async with host.context() as ctx:
+                page = await self._open_page(ctx)
+                try:
+                    async def on_response(resp):
+                        try:
+                            if "json" not in resp.headers.get("content-type", ""):
+                                return
+                            text = await resp.text()
+                            if '"board"' in text:
+                                harvest_boards(json_loads(text), boards, owner)
+                        except Exception:
+                            pass
+
+                    page.on("response", on_response)
+                    try:
+                        with self.metrics.phase("page_load"):
+                            await page.goto(target, wait_until="networkidle", timeout=35000)
+                    except PWTimeout:
+                        self.log("⏱ Timeout — ادامه...", "warning")
+
+                    prev, no_change = -1, 0
+                    for _ in range(MAX_SCROLLS):
+                        for b in await page.evaluate(BOARD_LINKS_JS, owner):
+                            boards.setdefault(b["url"], {"id": "", "pin_count": 0, **b})
+                        no_change = no_change + 1 if len(boards) == prev else 0
+                        if no_change >= NO_CHANGE_MAX:
+                            break
+                        prev = len(boards)
+                        await page.evaluate("window.scrollTo(0, document.body.scrollHeight)")
+                        await asyncio.sleep(SCROLL_PAUSE)
+                finally:
+                    with contextlib.suppress(Exception):
+                        await page.close()
+        finally:
+            if own:
+                await host.close()
+
+        self._log_traffic()
+        self.log(f"📚 {len(boards)} برد")
+        return list(boards.values())
+
+    async def _open_page(self, ctx):
+        """صفحه‌ی تازه با stealth، سیاست --resources و شمارش ترافیک"""
+        page = await ctx.new_page()
+        # playwright-stealth v2
+        if HAS_STEALTH and STEALTH_V2 and StealthClass:
+            try:
+                stealth = StealthClass()
+                await stealth.use_async(page)
+            except Exception as e:
+                self.log(f"stealth v2 error: {e}", "warning")
+
+        # playwright-stealth v1
+        elif HAS_STEALTH and not STEALTH_V2 and stealth_async:
+            try:
+                await stealth_async(page)
+            except Exception as e:
+                self.log(f"stealth v1 error: {e}", "warning")
+
+        # سیاست --resources؛ JSONها (xhr/fetch) و document هیچ‌وقت بلاک نمی‌شن
+        async def router(route):
+            rt  = route.request.resource_type
+            url = route.request.url
+            if rt in self.block or any(b in url for b in BLOCK_KWORDS):
+                self._count(rt, blocked=1)
+                await route.abort()
+            else:
+                await route.continue_()
+
+        async def on_finished(req):
+            try:
+                sizes = await req.sizes()
+                self._count(req.resource_type,
+                            sizes["responseBodySize"] + sizes["responseHeadersSize"], 1)
+            except Exception:
+                pass
+
+        await page.route("**/*", router)
+        page.on("requestfinished", on_finished)
+        return page
+
+    async def _scrape_in(self, ctx, target: str, pins: dict):
+        """یک صفحه‌ی تازه روی context داده‌شده؛ context مال BrowserHostه و بسته نمی‌شه"""
+        page = await self._open_page(ctx)
+        try:
+            # ── رهگیری همه JSON responses ────────────────────────
+            async def on_response(resp):
+                try:
+                    if "pinimg.com" in resp.url:
+                        return
+                    ct = resp.headers.get("content-type", "")
+                    if "json" not in ct:
+                        return
+                    text = await resp.text()
+                    self.metrics.add("json_responses")
+                    self.metrics.add("json_bytes", len(text))
+                    if '"images"' not in text or "pinimg.com" not in text:
+                        return
+                    before = len(pins)
+                    with self.metrics.phase("harvest"):
+                        await harvest_text(text, pins)
+                    gained = len(pins) - before
+                    if gained > 0:
+                        self.log(f"   [API] +{gained}  →  جمع: [bold green]{len(pins)}[/]", "dim")
+                        await self._publish(pins)
+                except Exception:
+                    pass
+
+            page.on("response", on_response)
+
+            # ── بارگذاری صفحه ────────────────────────────────────
+            try:
+                self.log("⏳ بارگذاری صفحه...", "dim")
+                with self.metrics.phase("page_load"):
+                    await page.goto(target, wait_until="networkidle", timeout=35000)
+                    if not pins:
+                        await self._await_batch(page, pins, LOAD_WAIT)
+            except PWTimeout:
+                self.log("⏱ Timeout — ادامه...", "warning")
+            except Exception as e:
+                self.log(f"⚠ {e}", "warning")
+
+            title_txt = await page.title()
+            self.log(f"📄 {title_txt}", "dim")
+
+            # Dark mode
+            if self.dark:
+                try:
+                    await page.evaluate("""
+                        document.documentElement.style.filter = 'invert(1) hue-rotate(180deg)';
+                        document.querySelectorAll('img,video').forEach(
+                            el => el.style.filter = 'invert(1) hue-rotate(180deg)'
+                        );
+                    """)
+                except Exception:
+                    pass
+
+            # DOM scan کامل قبل از اسکرول؛ بعدش فقط delta
+            await self._dom_scan(page, pins, full=True)
+
+            # ── اسکرول ───────────────────────────────────────────
+            self.log("📜 اسکرول برای بارگذاری پین‌ها...")
+            prev, no_change = 0, 0
+            wait = SCROLL_PAUSE
+
+            for i in range(MAX_SCROLLS):
+                if self.reached_known:
+                    self.log(f"✅ به {self._known_streak} پین قبلی رسیدیم — توقف incremental", "success")
+                    break
+                await page.evaluate(
+                    "window.scrollTo({top: document.body.scrollHeight, behavior: 'smooth'})"
+                )
+                took = await self._await_batch(page, pins, wait)
+                self.scroll_times.append(took)
+                self.metrics.add_phase("scroll", took)
+                self.metrics.observe("scroll_wait_seconds", took)
+
+                count = len(pins)
+                self.log(f"   Scroll {i+1:03d} | Pins: [bold green]{count}[/] | "
+                         f"{took:.2f}s / {wait:.1f}s", "dim")
+
+                # چیزی نرسید → دفعه بعد بیشتر صبر کن؛ رسید → برگرد به پایه
+                wait = SCROLL_PAUSE if count > prev else min(wait * 1.5, SCROLL_MAX_WAIT)
+
+                if count == prev:
+                    no_change += 1
+                    if no_change >= NO_CHANGE_MAX:
+                        self.log("✅ به انتهای صفحه رسیدیم", "success")
+                        break
+                else:
+                    no_change = 0
+                prev = count
+        finally:
+            with contextlib.suppress(Exception):
+                await page.close()
+
+    async def _await_batch(self, page, pins: dict, timeout: float) -> float:
+        """
+        به‌جای sleep ثابت: تا رسیدن پین تازه (JSON یا DOM) صبر می‌کنه، حداکثر timeout.
+        خروجی: ثانیه‌های صرف‌شده
+        """
+        loop   = asyncio.get_running_loop()
+        start  = loop.time()
+        before = len(pins)
+        while loop.time() - start < timeout:
+            self._activity.clear()
+            left = timeout - (loop.time() - start)
+            try:
+                await asyncio.wait_for(self._activity.wait(), min(SCROLL_POLL, left))
+            except asyncio.TimeoutError:
+                pass
+            await self._dom_scan(page, pins)
+            if len(pins) > before:
+                await asyncio.sleep(SCROLL_SETTLE)
+                await self._dom_scan(page, pins)
+                break
+        return loop.time() - start
+
+    def _count(self, rt: str, size: int = 0, requests: int = 0, blocked: int = 0):
+        t = self.traffic.setdefault(rt, [0, 0, 0])
+        t[0] += size; t[1] += requests; t[2] += blocked
+        if size:     self.metrics.add("browser_bytes", size, type=rt)
+        if requests: self.metrics.add("browser_requests", requests, type=rt)
+        if blocked:  self.metrics.add("browser_blocked", blocked, type=rt)
+
+    def _log_traffic(self):
+        if not self.traffic:
+            return
+        total = sum(t[0] for t in self.traffic.values())
+        parts = "  ".join(
+            f"{rt} {fmt_bytes(b)}" + (f" [dim](⛔{x})[/]" if x else "")
+            for rt, (b, _, x) in sorted(self.traffic.items(), key=lambda kv: -kv[1][0])
+        )
+        self.log(f"📦 ترافیک مرورگر ({self.resources}): {fmt_bytes(total)} | {parts}", "dim")
+
+    def _log_scroll_stats(self):
+        ts = sorted(self.scroll_times)
+        if not ts:
+            return
+        p95 = ts[min(len(ts) - 1, int(len(ts) * 0.95))]
+        self.log(
+            f"⏱  اسکرول‌ها: {len(ts)} | جمع {sum(ts):.1f}s | "
+            f"min {ts[0]:.2f}s  avg {sum(ts) / len(ts):.2f}s  p95 {p95:.2f}s  max {ts[-1]:.2f}s",
+            "dim",
+        )
+
+    async def _dom_scan(self, page, pins: dict, full: bool = False):
+        """
+        فقط پین‌هایی که از scan قبلی به DOM اضافه شدن از bridge رد می‌شن.
+        full=True (یا وقتی observer نیست، مثلاً بعد از navigation) یک بار کل
+        سند رو بررسی می‌کنه؛ seen داخل JS تکراری‌ها رو حذف می‌کنه.
+        """
+        with self.metrics.phase("dom_scan"):
+            await self._dom_items(page, pins, full)
+        await self._publish(pins)
+
+    async def _dom_items(self, page, pins: dict, full: bool):
+        try:
+            if not full:
+                items = await page.evaluate("() => window.__pdl ? window.__pdl.drain() : null")
+            if full or items is None:
+                await page.evaluate(OBSERVER_JS)
+                items = await page.evaluate("() => { window.__pdl.rescan(); return window.__pdl.drain(); }")
+
+            for item in (items or []):
+                src  = item.get("src", "")
+                href = item.get("href", "")
+                alt  = item.get("alt", "")
+                if not src or "pinimg.com" not in src:
+                    continue
+                m = re.search(r'/pin/(\d+)', href)
+                if not m:
+                    continue
+                pid = m.group(1)
+                if pid not in pins:
+                    url_736 = re.sub(r'/\d+x\d*/', '/736x/', src.split('?')[0])
+                    pins[pid] = {
+                        "pin_id": pid,
+                        "url":    url_736,
+                        "title":  sanitize(alt) or f"pin_{pid}",
+                    }
+        except Exception:
+            pass
+
+
+# ══════════════════════════════════════════════════════
+#  انتخاب رزولوشن تطبیقی
+# ══════════════════════════════════════════════════════
+
+class VariantResolver:
+    """
+    آمار موفقیت هر variant روی هر host رو نگه می‌داره.
+    variantهایی که تقریباً همیشه 404 می‌دن (معمولاً originals) به ته لیست
+    منتقل می‌شن؛ ترتیب کیفیت بقیه دست نمی‌خوره.
+    """
+
+    def __init__(self):
+        self.stats: dict[tuple[str, str], list[int]] = {}   # (host, variant) → [hit, try]
+        self.pins   = 0
+        self.saved  = 0     # درخواست‌هایی که به لطف آمار اصلاً فرستاده نشدن
+        self.probed = 0     # درخواست GET که HEAD جلوشو گرفت
+        self.heads  = 0     # HEADهای فرستاده‌شده (--probe) — هزینه، از saved کم می‌شه
+        self.wasted = 0     # GETهای ناموفق
+
+    def _dead(self, host: str, label: str) -> bool:
+        hit, tries = self.stats.get((host, label), (0, 0))
+        return tries >= VARIANT_MIN_SAMPLES and hit / tries < VARIANT_SKIP_RATE
+
+    def unsure(self, url: str, label: str) -> bool:
+        """هنوز معلوم نیست این variant روی این host هست یا نه (فقط اینجا HEAD می‌ارزه)"""
+        hit, tries = self.stats.get((urlparse(url).netloc, label), (0, 0))
+        return tries < VARIANT_MIN_SAMPLES or VARIANT_SKIP_RATE <= hit / tries < VARIANT_SURE_RATE
+
+    @property
+    def net_saved(self) -> int:
+        return self.saved + self.probed - self.heads
+
+    def order(self, url: str) -> list[tuple[int, str, str]]:
+        """[(rank, variant, url)] — rank جایگاه در ترتیب کیفیت اصلیه"""
+        self.pins += 1
+        host    = urlparse(url).netloc
+        explore = self.pins % VARIANT_EXPLORE == 0
+        keep, demoted = [], []
+        for rank, (label, u) in enumerate(variant_urls(url)):
+            if not explore and self._dead(host, label):
+                demoted.append((rank, label, u))
+            else:
+                keep.append((rank, label, u))
+        return keep + demoted
+
+    def record(self, url: str, label: str, ok: bool):
+        st = self.stats.setdefault((urlparse(url).netloc, label), [0, 0])
+        st[1] += 1
+        if ok: st[0] += 1
+
+    def won(self, cands: list, pos: int):
+        """pin موفق شد: variantهای بهتری که عقب افتاده بودن = درخواست ذخیره‌شده"""
+        rank = cands[pos][0]
+        self.saved += sum(1 for r, _, _ in cands[pos + 1:] if r < rank)
+
+    def hits(self) -> dict[str, int]:
+        out: dict[str, int] = {}
+        for (_, label), (hit, _) in self.stats.items():
+            if hit: out[label] = out.get(label, 0) + hit
+        return out
+
+
+# ══════════════════════════════════════════════════════
+#  manifest (SQLite)
+# ══════════════════════════════════════════════════════
+
+class Manifest:
+    """
+    یک ردیف برای هر pin_id: وضعیت، variant انتخاب‌شده، حجم، sha256 و زمان‌ها.
+    پین‌های done یک بار توی حافظه لود می‌شن تا skip بدون stat و O(1) باشه.
+    """
+
+    def __init__(self, path: Path):
+        self.path = path
+        self.db   = sqlite3.connect(str(path), timeout=30)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS pins (
+                pin_id     TEXT PRIMARY KEY,
+                status     TEXT NOT NULL,
+                url        TEXT,
+                variant    TEXT,
+                fname      TEXT,
+                size       INTEGER,
+                sha256     TEXT,
+                attempts   INTEGER NOT NULL DEFAULT 0,
+                error      TEXT,
+                first_seen REAL,
+                updated    REAL
+            )
+        """)
+        self.db.execute("CREATE TABLE IF NOT EXISTS meta (key TEXT PRIMARY KEY, value TEXT)")
+        self.done: dict[str, str] = dict(
+            self.db.execute("SELECT pin_id, fname FROM pins WHERE status = 'done'")
+        )
+        self._buf: list[tuple[str, dict | tuple]] = []
+
+    def is_done(self, pid: str) -> bool:
+        return pid in self.done
+
+    def _upsert(self, pid: str, **cols):
+        now  = time.time()
+        cols = {"pin_id": pid, "first_seen": now, "updated": now, **cols}
+        keys = ", ".join(cols)
+        vals = ", ".join(f":{k}" for k in cols)
+        upd  = ", ".join(f"{k} = excluded.{k}" for k in cols if k not in ("pin_id", "first_seen"))
+        self._write(
+            f"INSERT INTO pins ({keys}, attempts) VALUES ({vals}, 1) "
+            f"ON CONFLICT(pin_id) DO UPDATE SET {upd}, attempts = attempts + 1",
+            cols,
+        )
+
+    def _write(self, sql: str, params):
+        self._buf.append((sql, params))
+        if len(self._buf) >= MANIFEST_BATCH:
+            self.commit()
+
+    def mark_done(self, pid: str, url: str, variant: str, fname: str,
+                  size: int, sha256: str | None):
+        self.done[pid] = fname
+        self._upsert(pid, status="done", url=url, variant=variant, fname=fname,
+                     size=size, sha256=sha256, error=None)
+
+    def mark_failed(self, pid: str, url: str, error: str):
+        self._upsert(pid, status="failed", url=url, error=error)
+
+    def forget(self, pid: str):
+        """ردیف done که فایلش دیگه نیست: پاک می‌شه تا پین دوباره دانلود بشه"""
+        self.done.pop(pid, None)
+        self._write("DELETE FROM pins WHERE pin_id = ?", (pid,))
+
+    def set_fname(self, pid: str, fname: str):
+        """بعد از جابه‌جایی فایل (migrate)؛ attempts دست نمی‌خوره"""
+        if pid in self.done:
+            self.done[pid] = fname
+        self._write("UPDATE pins SET fname = ? WHERE pin_id = ?", (fname, pid))
+
+    def get_meta(self, key: str) -> str | None:
+        row = self.db.execute("SELECT value FROM meta WHERE key = ?", (key,)).fetchone()
+        return row[0] if row else None
+
+    def set_meta(self, key: str, value: str):
+        self.db.execute("INSERT INTO meta (key, value) VALUES (?, ?) "
+                        "ON CONFLICT(key) DO UPDATE SET value = excluded.value", (key, value))
+        self.db.commit()
+
+    def commit(self):
+        """
+        نوشته‌ها توی حافظه جمع می‌شن و این‌جا در یک تراکنش کوتاه می‌رن؛ قفل
+        نوشتن SQLite فقط همین لحظه گرفته می‌شه نه بین دانلودها (--procs).
+        """
+        if self._buf:
+            with self.db:
+                for sql, params in self._buf:
+                    self.db.execute(sql, params)
+            self._buf.clear()
+
+    def close(self):
+        self.commit()
+        self.db.close()
+
+
+# ══════════════════════════════════════════════════════
+#  store محتوامحور (dedup بین پروفایل‌ها و sectionها)
+# ══════════════════════════════════════════════════════
+
+def canonical_key(url: str) -> str:
+    """مسیر pinimg بدون بخش اندازه: /736x/ab/cd/x.jpg و /originals/ab/cd/x.jpg → /ab/cd/x"""
+    path = urlparse(url.split("?")[0]).path
+    path = re.sub(r'/(?:\d+x\d*|originals)/', '/', path, count=1)
+    return os.path.splitext(path)[0]
+
+
+class ContentStore:
+    """
+    هر عکس یک بار با اسم sha256 زیر objects/ab/<sha><ext> ذخیره می‌شه و فایل‌های
+    پروفایل‌ها hardlink به همون هستن (اگه روی یک filesystem نباشن → کپی).
+    index.sqlite: کلید canonical URL → sha256 تا پین تکراری اصلاً دانلود نشه.
+    Downloader متدهای place/adopt رو روی thread صدا می‌زنه (کپی بین دو
+    filesystem کل عکسه)؛ db و بافر پشت _lock هستن.
+    """
+
+    def __init__(self, root: Path):
+        self.root = root
+        (root / "objects").mkdir(parents=True, exist_ok=True)
+        self.db = sqlite3.connect(str(root / "index.sqlite"), timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("PRAGMA synchronous=NORMAL")
+        self.db.execute("""
+            CREATE TABLE IF NOT EXISTS objects (
+                key     TEXT PRIMARY KEY,
+                sha256  TEXT NOT NULL,
+                ext     TEXT NOT NULL,
+                size    INTEGER NOT NULL,
+                variant TEXT,
+                added   REAL
+            )
+        """)
+        self._buf: dict[str, tuple] = {}     # مثل Manifest: تا commit فقط توی حافظه
+
+    def object_path(self, sha: str, ext: str) -> Path:
+        return self.root / "objects" / sha[:2] / f"{sha}{ext}"
+
+    def lookup(self, url: str) -> tuple[str, str, int, str] | None:
+        """(sha256, ext, size, variant) اگه این عکس قبلاً ذخیره شده"""
+        key = canonical_key(url)
+        with self._lock:
+            if key in self._buf:
+                return self._buf[key][1:5]
+            return self.db.execute(
+                "SELECT sha256, ext, size, variant FROM objects WHERE key = ?", (key,),
+            ).fetchone()
+
+    def place(self, url: str, dest: Path) -> tuple[str, str, int, str] | None:
+        """lookup + link با یک رفت‌وبرگشت thread؛ خروجی lookup اگه dest از store پر شد"""
+        hit = self.lookup(url)
+        if hit and self.link(self.object_path(hit[0], hit[1]), dest):
+            return hit
+        return None
+
+    def link(self, obj: Path, dest: Path) -> bool:
+        """dest رو (اتمیک) به obj لینک می‌کنه؛ False اگه obj گم شده باشه"""
+        tmp = dest.with_name(dest.name + ".lnk")
+        try:
+            os.link(obj, tmp)
+        except FileNotFoundError:
+            return False
+        except OSError:
+            shutil.copyfile(obj, tmp)        # filesystem دیگه
+        os.replace(tmp, dest)
+        return True
+
+    def adopt(self, fpath: Path, url: str, variant: str, sha: str, size: int):
+        """فایل تازه دانلودشده رو وارد store می‌کنه (یا اگه محتوا تکراریه به نسخه موجود لینکش می‌کنه)"""
+        ext = fpath.suffix
+        obj = self.object_path(sha, ext)
+        if obj.exists():
+            self.link(obj, fpath)
+        else:
+            obj.parent.mkdir(exist_ok=True)
+            try:
+                os.link(fpath, obj)
+            except FileExistsError:
+                self.link(obj, fpath)
+            except OSError:
+                shutil.copyfile(fpath, obj)
+        key = canonical_key(url)
+        with self._lock:
+            self._buf[key] = (key, sha, ext, size, variant, time.time())
+            full = len(self._buf) >= MANIFEST_BATCH
+        if full:
+            self.commit()
+
+    def commit(self):
+        with self._lock:
+            if self._buf:
+                with self.db:
+                    self.db.executemany("INSERT OR REPLACE INTO objects VALUES (?, ?, ?, ?, ?, ?)",
+                                        self._buf.values())
+                self._buf.clear()
+
+
+# ══════════════════════════════════════════════════════
+#  همزمانی تطبیقی (AIMD) + token bucket هر host
+# ══════════════════════════════════════════════════════
+
+def retry_after(headers) -> float | None:
+    """Retry-After به ثانیه (عدد یا تاریخ HTTP)"""
+    val = headers.get("Retry-After")
+    if not val:
+        return None
+    try:
+        return max(0.0, float(val))
+    except ValueError:
+        pass
+    try:
+        return max(0.0, email.utils.parsedate_to_datetime(val).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class HostGate:
+    """
+    token bucket یک host که تا اولین throttle خاموشه (سقف فقط همزمانی -c/AIMD).
+    اولین 429/503 → سقف = نرخ اندازه‌گیری‌شده‌ی همین host؛ throttleهای بعدی
+    با همون AIMD_COOLDOWN limiter نصفش می‌کنن، پاسخ سالم +share و بالای
+    HOST_RATE_MAX دوباره خاموش. Retry-After همیشه رعایت می‌شه.
+    share: سهم این پردازه از سقف‌ها (با --procs هر کدوم 1/N).
+    """
+
+    def __init__(self, rate: float | None = None, share: float = 1.0):
+        self.share  = share
+        self.rate   = rate        # None = بدون سقف نرخ
+        self.tokens = 0.0
+        self.stamp  = time.monotonic()
+        self.pause_until = 0.0
+        self.seen   = 0.0         # نرخ درخواست در آخرین پنجره‌ی یک‌ثانیه‌ای
+        self._win   = self.stamp
+        self._n     = 0
+        self._last_cut = 0.0
+
+    async def take(self):
+        while True:
+            now = time.monotonic()
+            if now < self.pause_until:
+                await asyncio.sleep(self.pause_until - now)
+                continue
+            if now - self._win >= 1.0:
+                self.seen, self._win, self._n = self._n / (now - self._win), now, 0
+            if self.rate is None:
+                self._n += 1
+                return
+            self.tokens = min(self.rate, self.tokens + (now - self.stamp) * self.rate)
+            self.stamp  = now
+            if self.tokens >= 1:
+                self.tokens -= 1
+                self._n += 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+    def slow(self, wait: float | None):
+        now = time.monotonic()
+        if wait:
+            self.pause_until = max(self.pause_until, now + wait)
+        if now - self._last_cut < AIMD_COOLDOWN:
+            return
+        self._last_cut = now
+        if self.rate is None:
+            # اولین throttle: سقف = نرخ فعلی (پنجره‌ی قبلی یا همین پنجره‌ی نیمه‌کاره)؛
+            # limiter همزمان همزمانی رو نصف کرده، پس بار واقعی همین الان کم می‌شه
+            cur = self.seen or self._n / max(now - self._win, 0.1) or HOST_RATE * self.share
+            self.rate, self.tokens, self.stamp = max(HOST_RATE_MIN * self.share, cur), 0.0, now
+            return
+        self.rate = max(HOST_RATE_MIN * self.share, self.rate * AIMD_DECREASE)
+
+    def ok(self):
+        if self.rate is not None:
+            self.rate += self.share
+            if self.rate > HOST_RATE_MAX * self.share:
+                self.rate = None
+
+
+class AdaptiveLimiter:
+    """
+    جایگزین Semaphore با سقف متغیر (AIMD).
+    هر پاسخ سالم سقف رو 1/limit بالا می‌بره (≈ +1 در هر پنجره) به شرطی که
+    latency تا AIMD_LATENCY برابرِ بهترین مقدار دیده‌شده باشه؛ 429/503،
+    403 (جز originals) و timeout سقف رو نصف می‌کنن.
+    """
+
+    def __init__(self, start: int, hi: int = AIMD_MAX, lo: int = AIMD_MIN, share: float = 1.0):
+        self.share  = share
+        self.hi     = max(hi, start)
+        self.lo     = min(lo, start)
+        self.limit  = float(start)
+        self.active = 0
+        self.cuts   = 0
+        self.peak   = start
+        self.hosts: dict[str, HostGate] = {}
+        self._best  = None     # کمترین latency تا header
+        self._ewma  = None
+        self._last_cut = 0.0
+        self._cond  = asyncio.Condition()
+
+    async def __aenter__(self):
+        async with self._cond:
+            await self._cond.wait_for(lambda: self.active < int(self.limit))
+            self.active += 1
+        return self
+
+    async def __aexit__(self, *exc):
+        async with self._cond:
+            self.active -= 1
+            self._cond.notify()
+
+    def gate(self, host: str) -> HostGate:
+        g = self.hosts.get(host)
+        if g is None:
+            g = self.hosts[host] = HostGate(share=self.share)
+        return g
+
+    async def feedback(self, host: str, latency: float | None,
+                       throttled: bool, wait: float | None = None):
+        now = time.monotonic()
+        if throttled:
+            self.gate(host).slow(wait)
+            if now - self._last_cut >= AIMD_COOLDOWN:
+                self.limit = max(self.lo, self.limit * AIMD_DECREASE)
+                self.cuts += 1
+                self._last_cut = now
+            return
+        self.gate(host).ok()
+        if latency is not None:
+            self._best = latency if self._best is None else min(self._best, latency)
+            self._ewma = latency if self._ewma is None else 0.8 * self._ewma + 0.2 * latency
+            if self._ewma > self._best * AIMD_LATENCY + 0.05:
+                return
+        if self.limit < self.hi:
+            grew = int(self.limit + 1 / self.limit) > int(self.limit)
+            self.limit = min(self.hi, self.limit + 1 / self.limit)
+            self.peak  = max(self.peak, int(self.limit))
+            if grew:
+                async with self._cond:
+                    self._cond.notify_all()
+
+
+# ══════════════════════════════════════════════════════
+#  دانلودر async
+# ══════════════════════════════════════════════════════
+
+class FetchError(Exception):
+    """transient=True: timeout/5xx/429 → همین کاندید دوباره؛ False: 404/عکس نیست → کاندید بعدی"""
+
+    def __init__(self, msg: str, transient: bool):
+        super().__init__(msg)
+        self.transient = transient
+
+
+def img_session(limit: int) -> aiohttp.ClientSession:
+    conn = aiohttp.TCPConnector(limit=limit, ssl=False, ttl_dns_cache=300)
+    tout = aiohttp.ClientTimeout(total=60, connect=10, sock_read=30)
+    return aiohttp.ClientSession(connector=conn, timeout=tout, headers=IMG_HEADERS)
+
+def make_progress(con):
+    return Progress(
+        SpinnerColumn(style="cyan"),
+        TextColumn("[progress.description]{task.description}"),
+        BarColumn(bar_width=35, style="cyan", complete_style="green"),
+        TextColumn("[bold]{task.completed}/{task.total}[/]"),
+        TextColumn("[magenta]⚙ {task.fields[conc]}[/]"),
+        FileSizeColumn(),
+        TransferSpeedColumn(),
+        TimeRemainingColumn(),
+        console=con, expand=True,
+    )
+
+
+class DownloadPool:
+    """
+    session + بودجه همزمانی سراسری + Progress مشترک بین چند Downloader
+    (batch). هر پروفایل پوشه، manifest و شمارنده‌های خودش رو داره.
+    """
+
+    def __init__(self, budget: int = CONCURRENT_DL, con=None, max_budget: int = AIMD_MAX):
+        self.budget  = budget
+        self.con     = con
+        self.limiter = AdaptiveLimiter(budget, hi=max_budget)
+        self.session = None
+        self.prog    = None
+
+    async def __aenter__(self):
+        self.session = img_session(self.limiter.hi)
+        if RICH and self.con:
+            self.prog = make_progress(self.con)
+            self.prog.start()
+        return self
+
+    async def __aexit__(self, *exc):
+        if self.prog:
+            self.prog.stop()
+        await self.session.close()
+
+
+class Downloader:
+    def __init__(self, out: Path, concurrent: int = CONCURRENT_DL, probe: bool = False,
+                 pool: DownloadPool | None = None, max_concurrent: int = AIMD_MAX,
+                 store: ContentStore | None = None, metrics: Metrics | None = None,
+                 layout: str | None = None, share: float = 1.0):
+        self.out = out
+        self.concurrent = concurrent
+        self.probe = probe
+        self.pool = pool
+        self.store = store
+        self.limiter = pool.limiter if pool else AdaptiveLimiter(concurrent, hi=max_concurrent,
+                                                                 share=share)
+        self.out.mkdir(parents=True, exist_ok=True)
+        self.con = Console(theme=DARK_THEME) if RICH else None
+        self.ok = self.skip = self.fail = 0
+        self.retries = self.resumed = 0
+        self.linked = 0
+        self.resolver = VariantResolver()
+        self.manifest = Manifest(self.out / MANIFEST_NAME)
+        self.metrics  = metrics or Metrics()
+        self.layout   = self._layout(layout)
+        self.index: dict[str, str] | None = None   # pin_id → فایل موجود؛ اول consume پر می‌شه
+        self.parts: set[Path] = set()              # .partهای موجود، همراه index
+        self._dirs: set[Path] = {self.out}
+
+    def state(self) -> dict:
+        """شمارنده‌ها برای پردازه‌ی والد (--procs)"""
+        rs, lim = self.resolver, self.limiter
+        return {
+            "ok": self.ok, "skip": self.skip, "fail": self.fail, "retries": self.retries,
+            "resumed": self.resumed, "linked": self.linked,
+            "saved": rs.saved, "probed": rs.probed, "heads": rs.heads, "wasted": rs.wasted,
+            "limit": lim.limit, "peak": lim.peak, "cuts": lim.cuts,
+        }
+
+    def absorb(self, st: dict, stats: dict | None = None):
+        """نتیجه‌ی نهایی یک پردازه روی این Downloader جمع می‌شه (فقط برای خلاصه و گزارش)"""
+        for k in ("ok", "skip", "fail", "retries", "resumed", "linked"):
+            setattr(self, k, getattr(self, k) + st[k])
+        rs = self.resolver
+        rs.saved += st["saved"]; rs.probed += st["probed"]; rs.wasted += st["wasted"]
+        rs.heads += st["heads"]
+        for key, (hit, tries) in (stats or {}).items():
+            cur = rs.stats.setdefault(key, [0, 0])
+            cur[0] += hit; cur[1] += tries
+        lim = self.limiter
+        lim.limit += st["limit"]; lim.peak += st["peak"]; lim.cuts += st["cuts"]
+
+    def _layout(self, want: str | None) -> str:
+        """چیدمان پوشه توی manifest ثبت می‌شه؛ پوشه‌ی موجود چیدمانش رو نگه می‌داره"""
+        have = self.manifest.get_meta("layout")
+        if have and want and want != have:
+            self.log(f"⚠ {self.out} با چیدمان {have} ساخته شده — "
+                     f"برای تبدیل: --migrate-layout {self.out} --layout {want}", "warning")
+        layout = have or want or "flat"
+        if not have:
+            self.manifest.set_meta("layout", layout)
+        return layout
+
+    def _ensure_dir(self, d: Path):
+        if d not in self._dirs:
+            d.mkdir(parents=True, exist_ok=True)
+            self._dirs.add(d)
+
+    def summary(self) -> dict:
+        """نتیجه‌ی این پروفایل برای گزارش JSON"""
+        rs, lim = self.resolver, self.limiter
+        return {
+            "out": str(self.out), "ok": self.ok, "skip": self.skip, "fail": self.fail,
+            "retries": self.retries, "resumed_bytes": self.resumed, "linked": self.linked,
+            "variants": rs.hits(), "saved_requests": rs.net_saved, "probe_heads": rs.heads,
+            "wasted_requests": rs.wasted,
+            "concurrency": {"limit": round(lim.limit, 2), "peak": lim.peak, "cuts": lim.cuts},
+        }
+
+    def log(self, msg, style="info"):
+        if self.con: self.con.print(f"  {msg}", style=style)
+        else: print(f"  {plain_text(msg)}")
+
+    def _session(self):
+        if self.pool:
+            return contextlib.nullcontext(self.pool.session)
+        return img_session(self.limiter.hi)
+
+    def _progress(self):
+        if self.pool:
+            return contextlib.nullcontext(self.pool.prog)
+        if not (RICH and self.con):
+            return contextlib.nullcontext()
+        return make_progress(self.con)
+
+    async def run(self, pins: list[dict]):
+        """
+        صف محدود + N worker ثابت به‌جای یک coroutine برای هر پین؛
+        حافظه و سربار event loop به تعداد پین‌ها بستگی نداره.
+        """
+        queue = asyncio.Queue(maxsize=self.limiter.hi * 2)
+
+        async def feed():
+            for pin in pins:
+                await queue.put(pin)
+            await queue.put(None)
+
+        feeder = asyncio.create_task(feed())
+        try:
+            await self.consume(queue, total=len(pins))
+        finally:
+            feeder.cancel()
+
+    async def consume(self, queue: asyncio.Queue, total: int | None = None):
+        """
+        pool ثابت از workerها که از صف پین برمی‌دارن (run و حالت pipeline).
+        None توی صف یعنی تولیدکننده تموم کرده.
+        با Ctrl-C دیگه پین جدید برداشته نمی‌شه و دانلودهای در جریان تا
+        DRAIN_TIMEOUT فرصت تموم شدن دارن؛ بعدش cancel می‌شن.
+        """
+        lim      = self.limiter
+        m        = self.metrics
+        queued   = 0
+        stopping = False
+        busy: set[asyncio.Task] = set()
+        async with self._session() as session, contextlib.AsyncExitStack() as stack:
+            # close خودش commit می‌کنه؛ هر کار (مثلاً توی --serve) دیتابیسش رو آزاد کنه
+            stack.callback(self.manifest.close)
+            if self.store:
+                stack.callback(self.store.commit)
+            if self.index is None:
+                with m.phase("index"):
+                    parts: set[str] = set()
+                    self.index = await asyncio.to_thread(scan_output, self.out, parts)
+                    self.parts = {self.out / rel for rel in parts}
+            stack.enter_context(m.phase("download"))
+            with self._progress() as prog:
+                tid = None
+                if prog:
+                    desc = "📥 دانلود..." if total is not None else "📥 دانلود (pipeline)..."
+                    if self.pool:
+                        desc = f"📥 {self.out.name}"
+                    tid  = prog.add_task(desc, total=total or 0, conc=int(lim.limit))
+
+                async def worker():
+                    nonlocal queued
+                    while not stopping:
+                        pin = await queue.get()
+                        if pin is None:
+                            queue.put_nowait(None)   # بقیه workerها هم ببینن
+                            return
+                        if total is None:
+                            queued += 1
+                            if prog: prog.update(tid, total=queued)
+                        m.observe("queue_depth", queue.qsize(), DEPTH_BUCKETS)
+                        me = asyncio.current_task()
+                        busy.add(me)
+                        try:
+                            await self._dl(session, pin, prog, tid)
+                        except Exception as e:
+                            # خطای فایل‌سیستم (ENOSPC، EACCES، ...) فقط همین پین رو
+                            # ناموفق می‌کنه؛ worker زنده می‌مونه وگرنه pipeline گیر می‌کنه
+                            self._crashed(pin, e, prog, tid)
+                        finally:
+                            busy.discard(me)
+
+                # به تعداد سقف AIMD worker؛ limiter تعیین می‌کنه چندتا واقعاً فعال باشن
+                workers = [asyncio.create_task(worker()) for _ in range(lim.hi)]
+                try:
+                    await asyncio.wait(workers)
+                except asyncio.CancelledError:
+                    stopping = True
+                    self.log("⏹ توقف — منتظر دانلودهای در حال انجام...", "warning")
+                    for t in workers:
+                        if t not in busy:
+                            t.cancel()               # workerهای بیکار روی queue.get
+                    _, pending = await asyncio.wait(workers, timeout=DRAIN_TIMEOUT)
+                    for t in pending:
+                        t.cancel()
+                    await asyncio.gather(*pending, return_exceptions=True)
+                    raise
+                for t in workers:
+                    if t.exception():
+                        raise t.exception()
+        m.gauge("concurrency_limit", round(lim.limit, 2))
+        m.gauge("concurrency_peak", lim.peak)
+
+    def _crashed(self, pin: dict, e: Exception, prog=None, tid=None):
+        error = f"{type(e).__name__}: {e}"
+        self.log(f"❌ {pin.get('pin_id', '?')}: {error}", "error")
+        self.manifest.mark_failed(pin.get("pin_id", ""), pin.get("url", ""), error)
+        self.fail += 1
+        self.metrics.add("pins", result="fail")
+        if prog: prog.update(tid, advance=1, conc=int(self.limiter.limit))
+
+    async def _dl(self, session, pin, prog=None, tid=None):
+        def adv(result: str):
+            self.metrics.add("pins", result=result)
+            if prog: prog.update(tid, advance=1, conc=int(self.limiter.limit))
+
+        url   = pin.get("url", "")
+        title = pin.get("title", "pin")
+        pid   = pin.get("pin_id", "")
+
+        if not url or not url.startswith("http"):
+            self.skip += 1; adv("skip"); return
+
+        ext   = get_ext(url)
+        fname = pin_relpath(f"{sanitize(title)}_{pid}{ext}", pid, self.layout)
+        fpath = self.out / fname
+
+        # ردیف done فقط با فایل موجود معتبره: از index، وگرنه (پین تکراری همین اجرا) یک stat
+        if self.manifest.is_done(pid):
+            if pid in (self.index or {}) or (self.out / self.manifest.done[pid]).is_file():
+                self.skip += 1; adv("skip"); return
+            self.manifest.forget(pid)
+
+        # فایل بدون ردیف manifest (پوشه‌های قدیمی): از index، stat فقط روی همون یکی
+        if (old := (self.index or {}).get(pid)) and (size := file_size(self.out / old)) > MIN_IMAGE_SIZE:
+            self.manifest.mark_done(pid, url, "", old, size, None)
+            self.skip += 1; adv("skip"); return
+
+        self._ensure_dir(fpath.parent)
+
+        # همین عکس قبلاً (برای یک پروفایل/section دیگه) دانلود شده → بدون شبکه
+        # lookup و link/کپی روی thread — store ممکنه روی یک volume دیگه باشه
+        if self.store and (hit := await asyncio.to_thread(self.store.place, url, fpath)):
+            sha, _, size, variant = hit
+            self.manifest.mark_done(pid, url, variant, fname, size, sha)
+            self.linked += 1
+            self.ok += 1; adv("linked"); return
+
+        cands = self.resolver.order(url)
+        probe, error = None, "no candidate"
+        stale: list[str] = []     # variantهایی که .part نیمه‌کاره‌شون مونده
+        try:
+            for i, (_, label, try_url) in enumerate(cands):
+                if probe is not None:
+                    exists, probe = await probe, None
+                    if exists is False:
+                        self.resolver.record(try_url, label, False)
+                        self.resolver.probed += 1
+                        self.metrics.add("probe_skips", variant=label)
+                        continue
+                if (self.probe and i + 1 < len(cands) and self.resolver.unsure(try_url, label)
+                        and self.resolver.unsure(cands[i + 1][2], cands[i + 1][1])):
+                    # HEAD ارزون روی کاندید بعدی، موازی با GET فعلی — فقط وقتی آمار
+                    # هنوز نمی‌دونه GET فعلی جواب می‌ده و کاندید بعدی هست یا نه
+                    probe = asyncio.create_task(self._probe(session, cands[i + 1][2]))
+                got, error = await self._fetch_retry(session, try_url, fpath, label)
+                self.resolver.record(try_url, label, got is not None)
+                if got is not None:
+                    self.resolver.won(cands, i)
+                    self.manifest.mark_done(pid, try_url, label, fname, *got)
+                    if self.store:
+                        await asyncio.to_thread(self.store.adopt, fpath, try_url, label,
+                                                got[1], got[0])
+                    self._drop_parts(fpath, stale)
+                    self.ok += 1; adv("ok"); return
+                self.resolver.wasted += 1
+                stale.append(label)
+        finally:
+            if probe is not None:
+                probe.cancel()
+        self.manifest.mark_failed(pid, url, error or "")
+        self.fail += 1; adv("fail")
+
+    @staticmethod
+    def _part(fpath: Path, label: str) -> Path:
+        # هر variant فایل .part خودش رو داره تا resume فقط روی همون URL انجام بشه
+        return fpath.with_name(f"{fpath.name}.{label}{PART_SUFFIX}")
+
+    def _has_part(self, part: Path) -> bool:
+        """بدون index (Downloader بیرون از consume) نمی‌دونیم → باید دید"""
+        return self.index is None or part in self.parts
+
+    def _unlink_part(self, part: Path):
+        if self._has_part(part):
+            self.parts.discard(part)
+            try: part.unlink()
+            except OSError: pass
+
+    def _drop_parts(self, fpath: Path, labels: list[str]):
+        for label in labels:
+            self._unlink_part(self._part(fpath, label))
+
+    async def _fetch_retry(self, session, url: str, fpath: Path,
+                           label: str) -> tuple[tuple[int, str] | None, str | None]:
+        """
+        یک کاندید با retry. خطای گذرا (timeout، reset، 5xx، 429) → backoff نمایی با
+        jitter و ادامه‌ی .part با Range؛ 404 یا «عکس نیست» → بدون retry، کاندید بعدی.
+        اگه retryها تموم بشن .part برای اجرای بعد می‌مونه.
+        خروجی: ((حجم, sha256) یا None, خطا)
+        """
+        part = self._part(fpath, label)
+        err  = None
+        for attempt in range(RETRIES + 1):
+            try:
+                return await self._fetch(session, url, fpath, part, label), None
+            except FetchError as e:
+                err = f"{label}: {e}"
+                if not e.transient:
+                    self._unlink_part(part)
+                    return None, err
+            except (aiohttp.ClientError, asyncio.TimeoutError, ConnectionError) as e:
+                err = f"{label}: {type(e).__name__} {e}".strip()
+            if attempt < RETRIES:
+                self.retries += 1
+                self.metrics.add("retries", variant=label)
+                await asyncio.sleep(random.uniform(0, min(RETRY_MAX, RETRY_BASE * 2 ** attempt)))
+        return None, err
+
+    async def _probe(self, session, url: str) -> bool | None:
+        """
+        True/False اگه وضعیت قطعی باشه، None اگه معلوم نشد (GET رو بفرست).
+        مثل GET از limiter و gate host رد می‌شه و throttle رو گزارش می‌ده.
+        """
+        host = urlparse(url).netloc
+        try:
+            async with self.limiter:
+                await self.limiter.gate(host).take()
+                self.resolver.heads += 1
+                self.metrics.add("probe_heads")
+                async with session.head(url, allow_redirects=True) as r:
+                    if r.status in THROTTLE_STATUS:
+                        await self.limiter.feedback(host, None, True, retry_after(r.headers))
+                    if r.status == 200: return True
+                    if r.status in (403, 404, 410): return False
+        except Exception:
+            pass
+        return None
+
+    async def _fetch(self, session, url: str, fpath: Path, part: Path,
+                     label: str = "") -> tuple[int, str]:
+        """
+        دانلود تکه‌تکه داخل .part و rename اتمیک بعد از کامل شدن.
+        اگه .part از قبل باشه با Range: bytes=N- ادامه پیدا می‌کنه (206)؛
+        سرور اگه 200 بده از اول نوشته می‌شه.
+        وضعیت پاسخ و latency به limiter گزارش می‌شه (403 روی originals یعنی
+        «وجود نداره»، نه throttle). زمان کامل درخواست و بایت‌ها به تفکیک
+        status/variant توی metrics. شکست → FetchError یا خطای aiohttp.
+        خروجی: (حجم, sha256)
+        """
+        host    = urlparse(url).netloc
+        # stat فقط برای .partی که index (یا همین اجرا) می‌شناسه، نه برای هر درخواست
+        offset  = file_size(part) if self._has_part(part) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else None
+        throttle_403 = label != "originals"
+        status, got  = "error", 0
+
+        async with self.limiter:
+            await self.limiter.gate(host).take()
+            t0 = time.monotonic()
+            try:
+                async with session.get(url, headers=headers) as r:
+                    status    = r.status
+                    throttled = r.status in THROTTLE_STATUS or (r.status == 403 and throttle_403)
+                    await self.limiter.feedback(host, time.monotonic() - t0, throttled,
+                                                retry_after(r.headers) if throttled else None)
+                    if r.status == 416 or (r.status == 206 and not r.headers.get(
+                            "Content-Range", "").startswith(f"bytes {offset}-")):
+                        self._unlink_part(part)          # .part خرابه → از اول
+                        raise FetchError(f"http {r.status} (range)", True)
+                    if r.status not in (200, 206):
+                        raise FetchError(f"http {r.status}",
+                                         r.status in RETRY_STATUS or throttled)
+                    if r.status == 200:
+                        offset = 0
+                    if r.content_length is not None and offset + r.content_length <= MIN_IMAGE_SIZE:
+                        raise FetchError("too small", False)
+
+                    h, head = hashlib.sha256(), b""
+                    if offset:
+                        head = await asyncio.to_thread(hash_prefix, part, h)
+                        self.resumed += offset
+                    size = offset
+                    self.parts.add(part)
+                    async with aiofiles.open(part, "ab" if offset else "wb") as f:
+                        async for chunk in r.content.iter_chunked(CHUNK_SIZE):
+                            if len(head) < 12:
+                                head += chunk[:12 - len(head)]
+                                if len(head) == 12 and not looks_like_image(head):
+                                    # HTML/خطا به‌جای عکس — ادامه نده
+                                    raise FetchError("not an image", False)
+                            await f.write(chunk)
+                            h.update(chunk)
+                            size += len(chunk)
+                            got  += len(chunk)
+            except (asyncio.TimeoutError, aiohttp.ServerDisconnectedError) as e:
+                status = "timeout" if isinstance(e, asyncio.TimeoutError) else "disconnect"
+                await self.limiter.feedback(host, None, True)
+                raise
+            finally:
+                m = self.metrics
+                m.observe("request_seconds", time.monotonic() - t0, status=status, variant=label)
+                m.add("bytes", got, variant=label)
+
+        if size <= MIN_IMAGE_SIZE or not looks_like_image(head):
+            raise FetchError("not an image", False)
+        os.replace(part, fpath)
+        self.parts.discard(part)
+        return size, h.hexdigest()
+
+
+# ══════════════════════════════════════════════════════
+#  دانلود چندپردازه‌ای (--procs)
+# ══════════════════════════════════════════════════════
+
+def shard_pins(pins: list[dict], n: int) -> list[list[dict]]:
+    """تقسیم پایدار بر اساس pin_id؛ هر پین همیشه سهم یک پردازه‌ی ثابته"""
+    shards: list[list[dict]] = [[] for _ in range(n)]
+    for pin in pins:
+        pid = str(pin.get("pin_id", ""))
+        shards[int(pid) % n if pid.isdigit() else hash(pid) % n].append(pin)
+    return shards
+
+
+def _proc_main(idx: int, out: str, pins: list[dict], kw: dict, store_root: str | None, q):
+    """entry هر پردازه (spawn)؛ Ctrl-C رو خود Downloader با drain مدیریت می‌کنه"""
+    try:
+        asyncio.run(_proc_run(idx, Path(out), pins, kw, store_root, q))
+    except KeyboardInterrupt:
+        pass
+
+
+async def _proc_run(idx: int, out: Path, pins: list[dict], kw: dict, store_root: str | None, q):
+    store = ContentStore(Path(store_root)) if store_root else None
+    dl    = Downloader(out, store=store, **kw)
+    dl.con = None
+    dl.log = lambda msg, style="info": q.put(("log", idx, msg, style))
+
+    async def report():
+        while True:
+            await asyncio.sleep(PROC_REPORT)
+            q.put(("state", idx, dl.state()))
+
+    reporter = asyncio.create_task(report())
+    try:
+        await dl.run(pins)
+    finally:
+        reporter.cancel()
+        q.put(("done", idx, dl.state(), dl.resolver.stats, dl.metrics))
+
+
+async def run_procs(out: Path, pins: list[dict], procs: int, con=None,
+                    store: ContentStore | None = None, metrics: Metrics | None = None,
+                    **kw) -> Downloader:
+    """
+    pinها بر اساس pin_id بین procs پردازه تقسیم می‌شن؛ هر کدوم Downloader کامل
+    خودش رو داره (event loop، session، AIMD) با سهمی از بودجه‌ی همزمانی.
+    والد فقط شمارنده‌ها رو از صف multiprocessing جمع می‌کنه و یک progress و
+    یک خلاصه می‌سازه. manifest و store همون فایل‌های SQLite (WAL) مشترکن.
+    خروجی: Downloaderی که فقط جمع نتیجه‌هاست (برای show_summary / گزارش)
+    """
+    shards = [sh for sh in shard_pins(pins, procs) if sh]
+    agg    = Downloader(out, store=store, metrics=metrics, **kw)
+    agg.limiter.limit = agg.limiter.peak = 0
+    n = len(shards)
+    child_kw = dict(kw, layout=agg.layout, share=1 / n,
+                    concurrent=max(AIMD_MIN, kw.get("concurrent", CONCURRENT_DL) // n),
+                    max_concurrent=max(AIMD_MIN, kw.get("max_concurrent", AIMD_MAX) // n))
+    agg.log(f"🧵 {n} پردازه — همزمانی هر کدوم {child_kw['concurrent']}→{child_kw['max_concurrent']}", "dim")
+
+    ctx     = multiprocessing.get_context("spawn")
+    q       = ctx.Queue()
+    root    = str(store.root) if store else None
+    workers = [ctx.Process(target=_proc_main, args=(i, str(out), sh, child_kw, root, q), daemon=True)
+               for i, sh in enumerate(shards)]
+    for w in workers:
+        w.start()
+
+    states: dict[int, dict] = {}
+    finished = 0
+    with agg._progress() as prog:
+        tid = prog.add_task(f"📥 دانلود ({n} پردازه)...", total=len(pins), conc=0) if prog else None
+        try:
+            while finished < n:
+                try:
+                    msg = await asyncio.to_thread(q.get, True, PROC_POLL)
+                except queue.Empty:
+                    if not any(w.is_alive() for w in workers):
+                        agg.log("⚠ پردازه‌ای بدون گزارش پایان خارج شد", "warning")
+                        break
+                    continue
+                kind, i, *rest = msg
+                if kind == "log":
+                    agg.log(*rest)
+                    continue
+                states[i] = rest[0]
+                if kind == "done":
+                    finished += 1
+                    agg.absorb(rest[0], rest[1])
+                    agg.metrics.merge(rest[2])
+                if prog:
+                    cur = states.values()
+                    prog.update(tid, completed=sum(st["ok"] + st["skip"] + st["fail"] for st in cur),
+                                conc=int(sum(st["limit"] for st in cur)))
+        finally:
+            # با Ctrl-C خود پردازه‌ها هم SIGINT گرفتن و دارن drain می‌کنن
+            for w in workers:
+                await asyncio.to_thread(w.join, DRAIN_TIMEOUT + 5)
+                if w.is_alive():
+                    w.terminate()
+            agg.manifest.close()
+    return agg
+
+
+# ══════════════════════════════════════════════════════
+#  انتخاب موتور
+# ══════════════════════════════════════════════════════
+
+async def scrape_profile(engine: str, profile_url: str, section: str,
+                         dark: bool = True, headless: bool = True,
+                         browser_host: BrowserHost | None = None,
+                         metrics: Metrics | None = None,
+                         resources: str = RESOURCE_DEFAULT,
+                         board: dict | None = None, **kw) -> list[dict]:
+    """
+    engine: api / browser / auto.
+    auto اول API رو امتحان می‌کنه و فقط اگه خطا بده یا ناقص بمونه سراغ
+    مرورگر می‌ره؛ پین‌هایی که API قبلاً فرستاده دوباره توی صف نمی‌رن.
+    browser_host: مرورگر مشترک (batch)؛ نبود → هر scrape مرورگر خودش.
+    board: فقط پین‌های یک برد (از list_boards)؛ برد بدون id فقط با مرورگر.
+    """
+    metrics = metrics or Metrics()
+    api_pins: list[dict] = []
+    api_ok  = bool(board["id"]) if board else section in API_RESOURCES
+    if engine in ("api", "auto") and api_ok:
+        api = ApiScraper(metrics)
+        try:
+            api_pins = await api.scrape(profile_url, section, board=board, **kw)
+        except Exception as e:
+            if engine == "api":
+                raise
+            api.log(f"⚠ API: {e}", "warning")
+        if engine == "api" or (api.complete and api_pins) or api.reached_known:
+            return api_pins
+        api.log("↩ برگشت به مرورگر (Playwright)...", "warning")
+    elif engine == "api":
+        raise ValueError(f"section '{section}' با موتور API پشتیبانی نمی‌شه")
+
+    seen    = {p["pin_id"] for p in api_pins}
+    scraper = PinterestScraper(dark=dark, headless=headless, metrics=metrics, resources=resources)
+    pins    = await scraper.scrape(profile_url, section, skip_ids=seen, host=browser_host,
+                                   board=board, **kw)
+    return api_pins + [p for p in pins if p["pin_id"] not in seen]
+
+
+async def list_boards(engine: str, profile_url: str,
+                      dark: bool = True, headless: bool = True,
+                      browser_host: BrowserHost | None = None,
+                      metrics: Metrics | None = None,
+                      resources: str = RESOURCE_DEFAULT) -> list[dict]:
+    """
+    بردهای کاربر، بزرگ‌ترین اول: crawl همزمان که بردهای بزرگ رو زودتر شروع
+    کنه زمان کلش به بزرگ‌ترین برد نزدیک می‌مونه. انتخاب موتور مثل scrape_profile.
+    """
+    metrics = metrics or Metrics()
+    boards: list[dict] = []
+    if engine in ("api", "auto"):
+        api = ApiScraper(metrics)
+        try:
+            boards = await api.boards(profile_url)
+        except Exception as e:
+            if engine == "api":
+                raise
+            api.log(f"⚠ API: {e}", "warning")
+        if not boards and engine == "auto":
+            api.log("↩ برگشت به مرورگر (Playwright)...", "warning")
+    if not boards and engine != "api":
+        scraper = PinterestScraper(dark=dark, headless=headless, metrics=metrics, resources=resources)
+        boards  = await scraper.boards(profile_url, host=browser_host)
+    return sorted(boards, key=lambda b: -b["pin_count"])
+
+
+# ══════════════════════════════════════════════════════
+#  UI
+# ══════════════════════════════════════════════════════
+
+def show_banner(con):
+    if not con:
+        print("=" * 46 + "\n  Pinterest Downloader ⚡ v4\n" + "=" * 46); return
+    t = Text()
+    t.append("  ╔══════════════════════════════════╗\n", "bold magenta")
+    t.append("  ║  🖼  Pinterest Downloader  ⚡  v4 ║\n", "bold cyan")
+    t.append("  ║  دانلودر پروفایل پینترست         ║\n", "bold white")
+    t.append("  ╚══════════════════════════════════╝",   "bold magenta")
+    con.print(t); con.print()
+
+def show_summary(con, dl: Downloader):
+    if not con:
+        rs = dl.resolver
+        print(f"\nDone:{dl.ok}  Skipped:{dl.skip}  Failed:{dl.fail}  "
+              f"Saved-requests:{rs.net_saved}  Probe-HEADs:{rs.heads}  Wasted:{rs.wasted}  "
+              f"Retries:{dl.retries}  Resumed-bytes:{dl.resumed}  Linked:{dl.linked}  "
+              f"Concurrency:{dl.limiter.limit:.0f}/peak {dl.limiter.peak}/cuts {dl.limiter.cuts}  "
+              f"Path:{dl.out}"); return
+    t = Table(box=box.ROUNDED, style="cyan", title="📊 نتیجه دانلود")
+    t.add_column("وضعیت", style="bold")
+    t.add_column("تعداد", justify="right", style="bold")
+    t.add_row("✅ دانلود شد",   f"[green]{dl.ok}[/]")
+    t.add_row("⏭  قبلاً بود",  f"[yellow]{dl.skip}[/]")
+    t.add_row("❌ خطا",         f"[red]{dl.fail}[/]")
+    if dl.store:
+        t.add_row("🔗 از store",  f"[green]{dl.linked}[/] [dim]({dl.store.root})[/]")
+    if dl.retries or dl.resumed:
+        t.add_row("🔁 retry",   f"[yellow]{dl.retries}[/] [dim](ادامه از {dl.resumed // 1024} KB)[/]")
+    lim = dl.limiter
+    t.add_row("⚙ همزمانی",     f"[magenta]{lim.limit:.0f}[/] [dim](اوج: {lim.peak}, کاهش: {lim.cuts})[/]")
+    rs = dl.resolver
+    if rs.stats:
+        hits = "  ".join(f"{k}:{v}" for k, v in sorted(rs.hits().items()))
+        t.add_row("🎯 variant",     f"[cyan]{hits or '-'}[/]")
+        t.add_row("⚡ درخواست ذخیره‌شده",
+                  f"[green]{rs.net_saved}[/] [dim](هدررفته: {rs.wasted}, HEAD: {rs.heads})[/]")
+    t.add_row("📁 مسیر ذخیره", f"[cyan]{dl.out}[/]")
+    con.print(t)
+
+def show_boards(con, dls: list[Downloader]):
+    """یک ردیف برای هر برد (show_summary برای ده‌ها برد زیادی بلنده)"""
+    tot = [sum(getattr(dl, k) for dl in dls) for k in ("ok", "skip", "fail")]
+    if not con:
+        for dl in dls:
+            print(f"  {dl.out.name}: Done:{dl.ok}  Skipped:{dl.skip}  Failed:{dl.fail}")
+        print(f"\nBoards:{len(dls)}  Done:{tot[0]}  Skipped:{tot[1]}  Failed:{tot[2]}  "
+              f"Path:{dls[0].out.parent}"); return
+    t = Table(box=box.ROUNDED, style="cyan", title="📊 نتیجه دانلود بردها")
+    t.add_column("برد", style="bold")
+    t.add_column("✅", justify="right", style="green")
+    t.add_column("⏭", justify="right", style="yellow")
+    t.add_column("❌", justify="right", style="red")
+    for dl in dls:
+        t.add_row(dl.out.name, str(dl.ok), str(dl.skip), str(dl.fail))
+    t.add_section()
+    t.add_row(f"[bold]{len(dls)} برد[/] [dim]({dls[0].out.parent})[/]", *map(str, tot))
+    con.print(t)
+
+
+# ══════════════════════════════════════════════════════
+#  main
+# ══════════════════════════════════════════════════════
+
+def say(con, rich_msg: str, plain_msg: str):
+    (con.print(rich_msg) if con else print(plain_msg))
+
+def positive_int(text: str) -> int:
+    """type= برای argparse: عدد صحیح ≥ 1"""
+    try:
+        n = int(text)
+    except ValueError:
+        n = 0
+    if n < 1:
+        raise argparse.ArgumentTypeError(f"باید عدد صحیح مثبت باشه: {text}")
+    return n
+
+def parse_batch(path: Path, default_section: str) -> list[tuple[str, str]]:
+    """
+    هر خط: URL پروفایل و (اختیاری) section. خط خالی و # نادیده گرفته می‌شن.
+        https://www.pinterest.com/miwits saved
+    """
+    jobs = []
+    for line in path.read_text(encoding="utf-8").splitlines():
+        line = line.split("#", 1)[0].strip()
+        if not line:
+            continue
+        parts   = line.split()
+        section = parts[1] if len(parts) > 1 else default_section
+        if section not in SECTIONS:
+            raise ValueError(f"{path}: section نامعتبر '{section}' در: {line}")
+        jobs.append((parts[0], section))
+    return jobs
+
+
+def new_downloader(args, out_dir: Path, **kw) -> Downloader:
+    return Downloader(out_dir, concurrent=args.concurrent, probe=args.probe,
+                      max_concurrent=args.max_concurrent, layout=args.layout, **kw)
+
+
+async def download_list(args, con, out_dir: Path, pins: list[dict], **kw) -> Downloader:
+    """لیست کامل پین‌ها: با --procs بین چند پردازه، وگرنه همین event loop"""
+    if args.procs > 1 and len(pins) > 1:
+        return await run_procs(out_dir, pins, args.procs, con, concurrent=args.concurrent,
+                               probe=args.probe, max_concurrent=args.max_concurrent,
+                               layout=args.layout, **kw)
+    dl = new_downloader(args, out_dir, **kw)
+    await dl.run(pins)
+    return dl
+
+
+def migrate_layout(out: Path, layout: str) -> int:
+    """
+    فایل‌های پین (و .partهای نیمه‌کاره) رو به چیدمان layout جابه‌جا می‌کنه،
+    fname توی manifest رو به‌روز و چیدمان جدید رو ثبت می‌کنه. خروجی: تعداد جابه‌جا‌شده
+    """
+    manifest = Manifest(out / MANIFEST_NAME)
+    moved = 0
+    try:
+        for rel in list(iter_output(out)):
+            m = PIN_FILE_RE.search(rel) or PIN_PART_RE.search(rel)
+            if not m:
+                continue
+            pid  = m.group(1)
+            name = rel.rsplit("/", 1)[-1]
+            dest = pin_relpath(name, pid, layout)
+            if dest != rel:
+                (out / dest).parent.mkdir(exist_ok=True)
+                os.replace(out / rel, out / dest)
+                moved += 1
+            if manifest.done.get(pid) in (rel, name):
+                manifest.set_fname(pid, dest)
+        if layout == "flat":
+            with os.scandir(out) as it:
+                shards = [e.path for e in it
+                          if e.is_dir() and len(e.name) == SHARD_DIGITS and e.name.isdigit()]
+            for d in shards:
+                with contextlib.suppress(OSError):
+                    os.rmdir(d)                   # فقط اگه خالی باشه
+        manifest.set_meta("layout", layout)
+    finally:
+        manifest.close()
+    return moved
+
+
+async def run_profile(args, con, profile_url: str, section: str, out_dir: Path,
+                      pool: DownloadPool | None = None,
+                      browser_host: BrowserHost | None = None,
+                      store: ContentStore | None = None,
+                      metrics: Metrics | None = None,
+                      board: dict | None = None,
+                      sem: asyncio.Semaphore | None = None) -> Downloader | None:
+    """
+    scrape + دانلود یک پروفایل/section (یا یک برد)؛ با pool همیشه pipeline
+    و روی pool مشترک.
+    sem (--batch-scrapes) فقط تا آخر scrape نگه داشته می‌شه؛ دُم دانلودها بیرونش
+    تموم می‌شن تا scrape بعدی همزمان شروع بشه.
+    """
+    dark     = not args.no_dark
+    pipeline = args.pipeline or pool is not None
+    known    = known_pin_ids(out_dir) if args.incremental else set()
+    if args.incremental:
+        say(con, f"  🔁 incremental: [cyan]{len(known)}[/] پین از قبل",
+            f"  incremental: {len(known)} known pins")
+
+    metrics   = metrics or Metrics()
+    scrape_kw = dict(dark=dark, headless=not args.show_browser, browser_host=browser_host,
+                     metrics=metrics, resources=args.resources, board=board,
+                     known=known, stop_after_known=args.incremental)
+
+    if pipeline:
+        async with sem or contextlib.nullcontext():
+            dl       = new_downloader(args, out_dir, pool=pool, store=store, metrics=metrics)
+            queue    = asyncio.Queue(maxsize=PIPELINE_QUEUE)
+            consumer = asyncio.create_task(dl.consume(queue))
+            scrape   = asyncio.create_task(scrape_profile(args.engine, profile_url, section,
+                                                          queue=queue, **scrape_kw))
+            # دانلودر از کار افتاد → اسکرپر روی صف پر برای همیشه منتظر نمونه
+            consumer.add_done_callback(
+                lambda t: t.cancelled() or t.exception() is None or scrape.cancel())
+            try:
+                pins = await scrape
+            except BaseException:
+                consumer.cancel()
+                if consumer.done() and not consumer.cancelled() and consumer.exception():
+                    raise consumer.exception()
+                raise
+        try:
+            await queue.put(None)
+            await consumer
+        except BaseException:
+            consumer.cancel()
+            raise
+    else:
+        async with sem or contextlib.nullcontext():
+            pins = await scrape_profile(args.engine, profile_url, section, **scrape_kw)
+
+    if not pins and board:
+        say(con, f"  [yellow]⚠ برد {board['url']} خالیه[/]", f"  empty board {board['url']}")
+        return dl if pipeline else None
+    if not pins:
+        msg = "❌ پین پیدا نشد! با --show-browser اجرا کن تا بررسی بشه"
+        say(con, f"[bold red]{msg}[/]", msg)
+        return None
+
+    if args.save_urls:
+        out_dir.mkdir(parents=True, exist_ok=True)
+        jp = out_dir / "pins.json"
+        json.dump(pins, open(str(jp), "w", encoding="utf-8"), ensure_ascii=False, indent=2)
+        say(con, f"  💾 [cyan]{jp}[/]", f"Saved: {jp}")
+
+    if not pipeline:
+        dl = await download_list(args, con, out_dir, pins, store=store, metrics=metrics)
+    return dl
+
+
+async def mirror_boards(args, con, profile_url: str, root: Path, pool: DownloadPool,
+                        browser_host: BrowserHost | None = None,
+                        store: ContentStore | None = None,
+                        metrics: Metrics | None = None,
+                        sem: asyncio.Semaphore | None = None) -> list[Downloader]:
+    """
+    section boards: لیست بردها، بعد هر برد یک run_profile جدا توی root/<slug>/
+    (manifest خودش) روی pool مشترک. بردها همزمان crawl می‌شن، حداکثر sem تا
+    و بزرگ‌ترها اول. فهرست بردها توی root/boards.json ثبت می‌شه.
+    """
+    sem = sem or asyncio.Semaphore(args.batch_scrapes)
+    async with sem:
+        boards = await list_boards(args.engine, profile_url, dark=not args.no_dark,
+                                   headless=not args.show_browser, browser_host=browser_host,
+                                   metrics=metrics, resources=args.resources)
+    if not boards:
+        msg = f"❌ بردی برای {get_username(profile_url)} پیدا نشد"
+        say(con, f"[bold red]{msg}[/]", msg)
+        return []
+
+    root.mkdir(parents=True, exist_ok=True)
+    index = [{**b, "dir": board_dir(b)} for b in boards]
+    (root / BOARDS_INDEX).write_text(json.dumps(index, ensure_ascii=False, indent=2), encoding="utf-8")
+    say(con, f"  📁 بردها → [cyan]{root}[/]", f"  boards -> {root}")
+
+    async def one(board: dict) -> Downloader | None:
+        try:
+            return await run_profile(args, con, profile_url, "boards", root / board["dir"],
+                                     pool=pool, browser_host=browser_host, store=store,
+                                     metrics=metrics, board=board, sem=sem)
+        except Exception as e:
+            say(con, f"  [bold red]❌ {board['url']}: {e}[/]", f"  FAILED {board['url']}: {e}")
+            return None
+
+    dls = await asyncio.gather(*[one(b) for b in index])
+    return [dl for dl in dls if dl is not None]
+
+
+async def feed_stdin(queue: asyncio.Queue) -> tuple[int, int]:
+    """
+    JSONL از stdin خط‌به‌خط همون لحظه توی صف می‌ره (مثلاً از یک producer دیگه
+    pipe شده). اگه اول stdin آرایه JSON باشه کل ورودی یک‌جا خونده می‌شه.
+    خروجی: (پین‌های صف‌شده, آیتم‌های نامعتبر)
+    """
+    sent = bad = 0
+    try:
+        while line := await asyncio.to_thread(sys.stdin.readline):
+            if not line.strip():
+                continue
+            if line.lstrip().startswith("["):
+                rest = await asyncio.to_thread(sys.stdin.read)
+                pins, bad_ = parse_pins([line + rest])
+                bad += bad_
+            else:
+                try:
+                    pin = pin_record(json_loads(line))
+                except ValueError:
+                    pin = None
+                pins = [pin] if pin else []
+                bad += not pin
+            for pin in pins:
+                await queue.put(pin)
+                sent += 1
+    finally:
+        await queue.put(None)
+    return sent, bad
+
+
+async def run_from_manifest(args, con, metrics: Metrics | None = None) -> Downloader | None:
+    """
+    فقط دانلود: pins.json (--save-urls) یا JSONL، یا '-' برای stdin.
+    نه مرورگر بالا می‌آد نه scrape؛ manifest پوشه پین‌های done رو رد می‌کنه،
+    پس همین برای retry ناموفق‌ها یا پر کردن دوباره‌ی mirror کافیه.
+    """
+    src     = args.from_manifest
+    out_dir = Path(args.output) if args.output else Path(src).parent
+    store   = ContentStore(Path(args.store)) if args.store else None
+
+    if src == "-":
+        dl       = new_downloader(args, out_dir, store=store, metrics=metrics)
+        queue    = asyncio.Queue(maxsize=PIPELINE_QUEUE)
+        feeder   = asyncio.create_task(feed_stdin(queue))
+        try:
+            await dl.consume(queue)
+        except BaseException:
+            feeder.cancel()
+            raise
+        sent, bad = await feeder
+    else:
+        pins, bad = parse_pins(Path(src).read_text(encoding="utf-8").splitlines(keepends=True))
+        say(con, f"  📄 [cyan]{src}[/]: {len(pins)} پین", f"  {src}: {len(pins)} pins")
+        if not pins:
+            msg = "❌ پین معتبری توی فایل نیست"
+            say(con, f"[bold red]{msg}[/]", msg)
+            return None
+        dl = await download_list(args, con, out_dir, pins, store=store, metrics=metrics)
+
+    if bad:
+        say(con, f"  [yellow]⚠ {bad} آیتم نامعتبر (بدون pin_id/url) رد شد[/]",
+            f"  skipped {bad} invalid items")
+    show_summary(con, dl)
+    return dl
+
+
+async def run_batch(args, con, metrics: Metrics | None = None) -> list[Downloader]:
+    """
+    چند پروفایل با یک Chromium (هر scrape یک context) و یک pool دانلود
+    با بودجه سراسری --concurrent. خروجی و خلاصه‌ی هر پروفایل جداست؛
+    metrics برای کل batch یکیه.
+    """
+    jobs = parse_batch(Path(args.batch), args.section)
+    root = Path(args.output or ".")
+    say(con, f"  📋 batch: [cyan]{len(jobs)}[/] پروفایل — "
+             f"scrape همزمان: {args.batch_scrapes}, دانلود همزمان: {args.concurrent}",
+        f"  batch: {len(jobs)} profiles")
+
+    scrape_sem = asyncio.Semaphore(args.batch_scrapes)
+    host       = browser_host(args, pool_size=args.batch_scrapes)
+    store      = ContentStore(Path(args.store)) if args.store else None
+    results: list[tuple[str, str, list[Downloader]]] = []
+
+    async def one(url: str, section: str):
+        out_dir = root / f"pinterest_{get_username(url)}_{section}"
+        try:
+            if section == "boards":
+                # هر برد یک scrape جدا که از همون scrape_sem سهم می‌گیره
+                dls = await mirror_boards(args, con, url, out_dir, pool, browser_host=host,
+                                          store=store, metrics=metrics, sem=scrape_sem)
+            else:
+                dl  = await run_profile(args, con, url, section, out_dir, pool=pool,
+                                        browser_host=host, store=store, metrics=metrics,
+                                        sem=scrape_sem)
+                dls = [dl] if dl is not None else []
+        except Exception as e:
+            say(con, f"  [bold red]❌ {url} ({section}): {e}[/]", f"  FAILED {url}: {e}")
+            dls = []
+        results.append((url, section, dls))
+
+    try:
+        async with DownloadPool(args.concurrent, con, max_budget=args.max_concurrent) as pool:
+            await asyncio.gather(*[one(u, s) for u, s in jobs])
+    finally:
+        await host.close()
+
+    for url, section, dls in results:
+        if not dls:
+            continue
+        say(con, f"\n  [bold]{get_username(url)}[/] / {section}", f"\n{url} / {section}")
+        if section == "boards":
+            show_boards(con, dls)
+        else:
+            show_summary(con, dls[0])
+    return [dl for _, _, dls in results for dl in dls]
+
+
+def browser_host(args, pool_size: int = 0, shared: bool = False) -> BrowserHost:
+    state = Path(args.browser_state) if args.browser_state else None
+    return BrowserHost(not args.show_browser, pool_size=pool_size, state_path=state, shared=shared)
+
+
+def profile_dir(args, root: Path = Path(".")) -> Path:
+    """--output اگه داده شده، وگرنه root/pinterest_<user>_<section>"""
+    if args.output:
+        return Path(args.output)
+    return root / f"pinterest_{get_username(args.profile_url)}_{args.section}"
+
+
+class BoardQueue:
+    """صف pipeline که به هر پین اسم بردش رو اضافه می‌کنه (/scrape با section boards)"""
+
+    def __init__(self, queue: asyncio.Queue, board: str):
+        self.queue = queue
+        self.board = board
+
+    async def put(self, pin: dict):
+        await self.queue.put({**pin, "board": self.board})
+
+
+class Daemon:
+    """
+    سرویس محلی گرم (--serve): یک Chromium با pool از contextهای آماده، یک
+    DownloadPool و store مشترک برای همه‌ی کارها؛ هر کار فقط هزینه‌ی بارگذاری
+    صفحه رو می‌ده. جواب‌ها JSON lines (application/x-ndjson) stream می‌شن.
+
+        POST /scrape    {"profile_url", "section"?, "engine"?, "incremental"?, "resources"?}
+            → {"event": "pin", ...} برای هر پین، آخر {"event": "done", "count", ...}
+              (section boards: هر پین "board" هم داره)
+        POST /download  همون + "output"?, "save_urls"?, "probe"?, "layout"?
+            → {"event": "progress", ...} هر DAEMON_TICK ثانیه، آخر {"event": "done", ...}
+              (section boards: "boards" = خلاصه‌ی هر برد)
+        GET  /health
+    خطا → {"event": "error", "error": ...}
+    """
+
+    JOB_KEYS = ("section", "engine", "incremental", "resources", "output",
+                "save_urls", "probe", "layout")
+
+    def __init__(self, args, con):
+        self.args  = args
+        self.con   = con
+        self.root  = Path(args.output or ".")
+        self.host  = browser_host(args, pool_size=args.contexts)
+        self.store = ContentStore(Path(args.store)) if args.store else None
+        self.sem   = asyncio.Semaphore(args.batch_scrapes)
+        self.pool: DownloadPool | None = None
+        self.jobs  = 0
+
+    def job_args(self, body) -> argparse.Namespace:
+        """
+        body درخواست → args کار. نوع‌ها قبل از تست عضویت چک می‌شن (لیست/دیکت
+        توی `in` روی tuple خطای 400 نمی‌ده، 500 می‌ده) و output باید زیر root بمونه.
+        """
+        if not isinstance(body, dict) or not isinstance(body.get("profile_url"), str) \
+                or not body["profile_url"]:
+            raise ValueError("profile_url لازمه")
+        for k in ("section", "engine", "resources", "layout", "output"):
+            if k in body and not isinstance(body[k], str) \
+                    and not (k in ("layout", "output") and body[k] is None):
+                raise ValueError(f"{k} باید رشته باشه")
+        inc = body.get("incremental", 0)
+        if not isinstance(inc, int) or inc < 0:      # bool هم int‌ه: true → KNOWN_STOP
+            raise ValueError(f"incremental باید true یا عدد صحیح مثبت باشه: {inc!r}")
+        extra = {k: body[k] for k in self.JOB_KEYS if k in body}
+        args  = argparse.Namespace(**{**vars(self.args), **extra, "procs": 1,
+                                      "profile_url": body["profile_url"],
+                                      "output": body.get("output")})
+        if args.output:
+            root = self.root.resolve()
+            out  = (root / args.output).resolve()
+            if not out.is_relative_to(root):
+                raise ValueError(f"output بیرون از {root}: {args.output}")
+            args.output = str(out)
+        if args.section not in SECTIONS:
+            raise ValueError(f"section نامعتبر: {args.section}")
+        if args.engine not in ("auto", "api", "browser"):
+            raise ValueError(f"engine نامعتبر: {args.engine}")
+        if args.resources not in RESOURCE_POLICIES:
+            raise ValueError(f"resources نامعتبر: {args.resources}")
+        if args.layout not in (None, *LAYOUTS):
+            raise ValueError(f"layout نامعتبر: {args.layout}")
+        args.incremental = KNOWN_STOP if args.incremental is True else int(args.incremental or 0)
+        return args
+
+    @staticmethod
+    async def _emit(resp, obj: dict):
+        await resp.write((json.dumps(obj, ensure_ascii=False) + "\n").encode())
+
+    async def _job(self, request, run, events):
+        """
+        قالب مشترک هر دو endpoint: اعتبارسنجی، شروع کار، stream رویدادها.
+        قطع اتصال کلاینت کار رو cancel می‌کنه.
+        """
+        from aiohttp import web
+        try:
+            args = self.job_args(await request.json())
+        except ValueError as e:
+            return web.json_response({"event": "error", "error": str(e)}, status=400,
+                                     dumps=lambda o: json.dumps(o, ensure_ascii=False))
+
+        resp = web.StreamResponse(headers={"Content-Type": "application/x-ndjson"})
+        await resp.prepare(request)
+        metrics = Metrics()
+        task = asyncio.create_task(run(args, metrics))
+        self.jobs += 1
+        try:
+            await events(resp, task, metrics)
+        except Exception as e:
+            with contextlib.suppress(ConnectionError):
+                await self._emit(resp, {"event": "error", "error": str(e) or type(e).__name__})
+        finally:
+            self.jobs -= 1
+            if not task.done():
+                task.cancel()
+                await asyncio.gather(task, return_exceptions=True)
+        return resp
+
+    async def scrape(self, request):
+        queue: asyncio.Queue = asyncio.Queue()      # بی‌سقف: پین‌ها کوچیکن و همون لحظه stream می‌شن
+
+        async def run(args, metrics):
+            out_dir = profile_dir(args, self.root)
+            common  = dict(dark=not args.no_dark, headless=not args.show_browser,
+                           browser_host=self.host, metrics=metrics, resources=args.resources)
+            try:
+                if args.section != "boards":
+                    known = known_pin_ids(out_dir) if args.incremental else set()
+                    async with self.sem:
+                        return await scrape_profile(
+                            args.engine, args.profile_url, args.section, queue=queue,
+                            known=known, stop_after_known=args.incremental, **common)
+                async with self.sem:
+                    boards = await list_boards(args.engine, args.profile_url, **common)
+
+                async def one(board):
+                    sub   = out_dir / board_dir(board)
+                    known = known_pin_ids(sub) if args.incremental else set()
+                    async with self.sem:
+                        return await scrape_profile(
+                            args.engine, args.profile_url, "boards", board=board,
+                            queue=BoardQueue(queue, board["url"]), known=known,
+                            stop_after_known=args.incremental, **common)
+
+                return [p for pins in await asyncio.gather(*map(one, boards)) for p in pins]
+            finally:
+                queue.put_nowait(None)
+
+        async def events(resp, task, metrics):
+            while (pin := await queue.get()) is not None:
+                await self._emit(resp, {"event": "pin", **pin})
+            pins = await task
+            await self._emit(resp, {"event": "done", "count": len(pins),
+                                    "phases_s": metrics.report()["phases_s"]})
+
+        return await self._job(request, run, events)
+
+    async def download(self, request):
+        async def run(args, metrics):
+            out_dir = profile_dir(args, self.root)
+            if args.section == "boards":
+                return await mirror_boards(args, None, args.profile_url, out_dir, self.pool,
+                                           browser_host=self.host, store=self.store,
+                                           metrics=metrics, sem=self.sem)
+            return await run_profile(args, None, args.profile_url, args.section, out_dir,
+                                     pool=self.pool, browser_host=self.host,
+                                     store=self.store, metrics=metrics, sem=self.sem)
+
+        def progress(metrics) -> dict:
+            return {"found": int(metrics.total("pins_found")),
+                    **{r: int(metrics.total("pins", result=r)) for r in ("ok", "linked", "skip", "fail")}}
+
+        async def events(resp, task, metrics):
+            while not task.done():
+                await asyncio.wait({task}, timeout=DAEMON_TICK)
+                await self._emit(resp, {"event": "progress", **progress(metrics)})
+            dl = task.result()
+            if isinstance(dl, list):
+                done = {**progress(metrics), "boards": [d.summary() for d in dl]}
+            else:
+                done = dl.summary() if dl else progress(metrics)
+            await self._emit(resp, {"event": "done", **done, "phases_s": metrics.report()["phases_s"]})
+
+        return await self._job(request, run, events)
+
+    async def health(self, request):
+        from aiohttp import web
+        return web.json_response({
+            "ok": True, "jobs": self.jobs, "warm_contexts": len(self.host.idle),
+            "browser": self.host.browser is not None,
+            "concurrency": round(self.pool.limiter.limit, 1) if self.pool else None,
+        })
+
+
+async def serve(args, con):
+    """--serve: تا Ctrl-C کار قبول می‌کنه؛ مرورگر و contextها از همون اول گرم می‌شن"""
+    from aiohttp import web
+    addr, _, port = args.serve.rpartition(":")
+    addr = addr or DAEMON_LISTEN
+    daemon = Daemon(args, con)
+
+    app = web.Application()
+    app.router.add_post("/scrape",   daemon.scrape)
+    app.router.add_post("/download", daemon.download)
+    app.router.add_get("/health",    daemon.health)
+
+    async with DownloadPool(args.concurrent, None, max_budget=args.max_concurrent) as pool:
+        daemon.pool = pool
+        if args.engine != "api":
+            try:
+                await daemon.host.warm()
+            except MissingDependency as e:
+                say(con, f"  [yellow]⚠ مرورگر در دسترس نیست ({e}) — فقط موتور API[/]",
+                    f"  browser unavailable ({e}) - API engine only")
+        runner = web.AppRunner(app, access_log=None)
+        await runner.setup()
+        await web.TCPSite(runner, addr, int(port)).start()
+        say(con, f"  🛰  سرویس روی [cyan]http://{addr}:{port}[/] — "
+                 f"{len(daemon.host.idle)} context گرم",
+            f"  serving on http://{addr}:{port}")
+        try:
+            await asyncio.Event().wait()
+        finally:
+            await runner.cleanup()
+            await daemon.host.close()
+
+
+def write_reports(args, con, metrics: Metrics, dls: list[Downloader]):
+    """--report (JSON) و --prom (textfile پرومتئوس)؛ حتی بعد از خطا/Ctrl-C"""
+    if args.report:
+        rep = metrics.report(argv=sys.argv[1:], profiles=[dl.summary() for dl in dls])
+        Metrics.write(Path(args.report), json.dumps(rep, ensure_ascii=False, indent=2))
+        say(con, f"  📈 [cyan]{args.report}[/]", f"Report: {args.report}")
+    if args.prom:
+        Metrics.write(Path(args.prom), metrics.prometheus())
+
+
+async def run_single(args, con, metrics: Metrics) -> list[Downloader]:
+    dark     = not args.no_dark
+    out_dir  = profile_dir(args)
+
+    if con:
+        con.print(Panel(
+            f"[cyan]Profile:[/]    [bold]{args.profile_url}[/]\n"
+            f"[cyan]Section:[/]    [bold]{args.section}[/]  "
+            f"[cyan]Engine:[/] [bold]{args.engine}[/]\n"
+            f"[cyan]Output:[/]     [bold]{out_dir}[/]\n"
+            f"[cyan]Concurrent:[/] [bold]{args.concurrent}[/]  "
+            f"[cyan]Dark:[/] [bold]{'✓' if dark else '✗'}[/]  "
+            f"[cyan]Pipeline:[/] [bold]{'✓' if args.pipeline else '✗'}[/]",
+            title="⚙️  Settings", border_style="magenta"
+        ))
+
+    store = ContentStore(Path(args.store)) if args.store else None
+    if args.section == "boards":
+        # بردها صفحه‌های یک context مشترکن (کوکی یکی، فقط یک context حافظه)
+        host = browser_host(args, shared=True)
+        try:
+            async with DownloadPool(args.concurrent, con, max_budget=args.max_concurrent) as pool:
+                dls = await mirror_boards(args, con, args.profile_url, out_dir, pool,
+                                          browser_host=host, store=store, metrics=metrics)
+        finally:
+            await host.close()
+        if dls:
+            show_boards(con, dls)
+        return dls
+
+    host  = browser_host(args) if args.browser_state else None
+    try:
+        dl = await run_profile(args, con, args.profile_url, args.section, out_dir,
+                               store=store, browser_host=host, metrics=metrics)
+    finally:
+        if host:
+            await host.close()
+    if dl is None:
+        return []
+    show_summary(con, dl)
+    return [dl]
+
+
+async def main():
+    ap = argparse.ArgumentParser(description="Pinterest Downloader v4")
+    ap.add_argument("profile_url", nargs="?")
+    ap.add_argument("--batch",      "-b", metavar="FILE",
+                    help="فایل لیست پروفایل‌ها (هر خط: URL [section])")
+    ap.add_argument("--batch-scrapes",    type=int, default=3,
+                    help="تعداد scrape همزمان در حالت batch و بردهای همزمان در --section boards")
+    ap.add_argument("--section",    "-s", choices=["created","saved","boards"], default="created")
+    ap.add_argument("--engine",     "-e", choices=["auto","api","browser"], default="auto",
+                    help="api: بدون مرورگر، browser: Playwright، auto: API و در صورت خطا مرورگر")
+    ap.add_argument("--output",     "-o", default=None)
+    ap.add_argument("--concurrent", "-c", type=int, default=CONCURRENT_DL,
+                    help="همزمانی شروع؛ بعد با AIMD بین 2 و --max-concurrent تنظیم می‌شه")
+    ap.add_argument("--max-concurrent",   type=int, default=AIMD_MAX,
+                    help="سقف همزمانی تطبیقی")
+    ap.add_argument("--resources",        choices=list(RESOURCE_POLICIES), default=RESOURCE_DEFAULT,
+                    help="چه منابعی توی مرورگر بلاک بشن: full هیچی، balanced عکس/فونت/مدیا، "
+                         "lean به‌علاوه CSS و بقیه")
+    ap.add_argument("--no-dark",          action="store_true")
+    ap.add_argument("--show-browser",     action="store_true")
+    ap.add_argument("--save-urls",        action="store_true")
+    ap.add_argument("--pipeline",         action="store_true",
+                    help="دانلود همزمان با اسکرول (producer/consumer)")
+    ap.add_argument("--incremental",      type=positive_int, nargs="?", const=KNOWN_STOP, default=0,
+                    metavar="N", help="بعد از N پین قبلاً دیده‌شده‌ی پشت‌سرهم اسکرول متوقف بشه")
+    ap.add_argument("--store",            metavar="DIR",
+                    help="store محتوامحور مشترک: هر عکس یک بار، فایل‌های پروفایل hardlink")
+    ap.add_argument("--layout",           choices=LAYOUTS, default=None,
+                    help="flat: همه فایل‌ها یک‌جا، sharded: زیرپوشه با دو رقم آخر pin_id "
+                         "(پیش‌فرض: چیدمان ثبت‌شده‌ی پوشه، وگرنه flat)")
+    ap.add_argument("--migrate-layout",   metavar="DIR",
+                    help="پوشه خروجی موجود رو به --layout تبدیل کن و خارج شو")
+    ap.add_argument("--serve",            metavar="[ADDR:]PORT",
+                    help=f"سرویس محلی گرم (مرورگر و contextها زنده می‌مونن)؛ پیش‌فرض ADDR {DAEMON_LISTEN}")
+    ap.add_argument("--contexts",         type=int, default=CONTEXT_POOL, metavar="N",
+                    help="تعداد context گرم در حالت --serve")
+    ap.add_argument("--browser-state",    metavar="FILE",
+                    help="کوکی‌ها/storage مرورگر بین اجراها اینجا ذخیره و بازیابی می‌شن")
+    ap.add_argument("--procs",            type=int, default=1, metavar="N",
+                    help="دانلود با N پردازه (تقسیم بر اساس pin_id)؛ بودجه همزمانی بینشون تقسیم می‌شه")
+    ap.add_argument("--probe",            action="store_true",
+                    help="HEAD موازی روی رزولوشن بعدی تا GETهای بی‌نتیجه حذف بشن")
+    ap.add_argument("--report",           metavar="FILE",
+                    help="گزارش JSON: زمان فازها، بایت‌ها، هیستوگرام latency، retryها")
+    ap.add_argument("--prom",             metavar="FILE",
+                    help="همون متریک‌ها به فرمت textfile پرومتئوس (node_exporter)")
+    ap.add_argument("--from-manifest",    metavar="FILE",
+                    help="فقط دانلود از pins.json یا JSONL ('-' = stdin)؛ بدون مرورگر")
+    ap.add_argument("--plain",            action="store_true",
+                    help="خروجی متنی ساده (rich لود نمی‌شه)")
+    args = ap.parse_args()
+    if args.migrate_layout:
+        if not args.layout:
+            ap.error("--migrate-layout به --layout نیاز داره")
+        if not Path(args.migrate_layout).is_dir():
+            ap.error(f"--migrate-layout: پوشه‌ی {args.migrate_layout} وجود نداره")
+        moved = migrate_layout(Path(args.migrate_layout), args.layout)
+        print(f"  {args.migrate_layout}: {moved} فایل → {args.layout}")
+        return
+    if args.serve:
+        con = Console(theme=DARK_THEME) if load_rich(args.plain) else None
+        show_banner(con)
+        await serve(args, con)
+        return
+    if not (args.profile_url or args.batch or args.from_manifest):
+        ap.error("profile_url، --batch یا --from-manifest لازمه")
+    if args.from_manifest == "-" and not args.output:
+        ap.error("--from-manifest - (stdin) به --output نیاز داره")
+    if args.procs > 1 and (args.pipeline or args.batch or args.from_manifest == "-"
+                           or args.section == "boards"):
+        print("  --procs فقط وقتی لیست کامل پین‌ها از قبل معلومه کار می‌کنه؛ اینجا نادیده گرفته شد")
+        args.procs = 1
+
+    con  = Console(theme=DARK_THEME) if load_rich(args.plain) else None
+    show_banner(con)
+
+    metrics = Metrics()
+    dls: list[Downloader] = []
+    try:
+        if args.from_manifest:
+            dl = await run_from_manifest(args, con, metrics)
+            dls = [dl] if dl is not None else []
+        elif args.batch:
+            dls = await run_batch(args, con, metrics)
+        else:
+            dls = await run_single(args, con, metrics)
+    finally:
+        write_reports(args, con, metrics, dls)
+
+
+if __name__ == "__main__":
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n  ⏹ لغو شد")
+    except MissingDependency as e:
+        print(e)
+        sys.exit(1)
\ No newline at end of file
@@ -0,0 +1,120 @@
+"""
+تست‌های رگرسیون Pinterest Downloader؛ همه روی StubServer محلی bench.py.
+
+    python -m pytest -q
+"""
+
+import asyncio
+import json
+import os
+import socket
+import sys
+from pathlib import Path
+
+import aiohttp
+import pytest
+
+import bench
+import main
+
+
+def stub_pins(srv: bench.StubServer, n: int) -> list[dict]:
+    return [{"pin_id": str(1000 + i), "url": f"{srv.cdn}/236x/{bench.pin_path(i)}",
+             "title": f"pin {i}"} for i in range(n)]
+
+
+def pin_files(out: Path) -> list[str]:
+    return sorted(rel for rel in main.iter_output(out) if main.PIN_FILE_RE.search(rel))
+
+
+def test_done_pin_with_deleted_file_is_refetched(tmp_path):
+    """manifest می‌گه done ولی فایل پاک شده → دوباره دانلود می‌شه، skip نه"""
+    async def go():
+        async with bench.StubServer(pins=10) as srv:
+            pins = stub_pins(srv, 10)
+            first = bench.quiet(main.Downloader(tmp_path))
+            await first.run(pins)
+            assert first.ok == 10
+            files = pin_files(tmp_path)
+            (tmp_path / files[3]).unlink()
+
+            again = bench.quiet(main.Downloader(tmp_path))
+            await again.run(pins)
+            return again, files
+
+    again, files = asyncio.run(go())
+    assert (again.ok, again.skip, again.fail) == (1, 9, 0)
+    assert pin_files(tmp_path) == files
+    manifest = main.Manifest(tmp_path / main.MANIFEST_NAME)
+    assert len(manifest.done) == 10
+    manifest.close()
+
+
+async def start_daemon(out: Path) -> tuple[asyncio.subprocess.Process, str]:
+    """main.py --serve -e api روی یک پورت آزاد؛ تا /health جواب بده صبر می‌کنه"""
+    with socket.socket() as sk:
+        sk.bind(("127.0.0.1", 0))
+        port = sk.getsockname()[1]
+    proc = await asyncio.create_subprocess_exec(
+        sys.executable, main.__file__, "--serve", f"127.0.0.1:{port}", "-e", "api",
+        "--plain", "-o", str(out), stdout=asyncio.subprocess.DEVNULL)
+    base = f"http://127.0.0.1:{port}"
+    async with aiohttp.ClientSession() as s:
+        for _ in range(100):
+            try:
+                async with s.get(f"{base}/health"):
+                    return proc, base
+            except aiohttp.ClientConnectionError:
+                await asyncio.sleep(0.1)
+    proc.kill()
+    raise RuntimeError("daemon بالا نیومد")
+
+
+async def post(s: aiohttp.ClientSession, url: str, body: dict) -> tuple[int, list[dict]]:
+    async with s.post(url, json=body) as r:
+        return r.status, [json.loads(line) async for line in r.content if line.strip()]
+
+
+def test_daemon_rejects_bad_incremental(tmp_path):
+    """incremental منفی/غیرعددی → 400، نه یک کار که بعد از صفحه‌ی اول متوقف بشه"""
+    async def go():
+        async with bench.StubServer(pins=60) as srv:
+            proc, base = await start_daemon(tmp_path)
+            try:
+                async with aiohttp.ClientSession() as s:
+                    bad = [await post(s, f"{base}/download", {"profile_url": f"{srv.base}/u1",
+                                                              "incremental": inc})
+                           for inc in (-5, "3", 2.5)]
+                    good = await post(s, f"{base}/download", {"profile_url": f"{srv.base}/u1",
+                                                              "incremental": True})
+            finally:
+                proc.terminate()
+                await proc.wait()
+            return bad, good
+
+    bad, (status, events) = asyncio.run(go())
+    for code, body in bad:
+        assert code == 400 and body[0]["event"] == "error" and "incremental" in body[0]["error"]
+    assert status == 200 and events[-1]["event"] == "done" and events[-1]["ok"] == 60
+
+
+@pytest.mark.skipif(not os.path.isdir("/proc/self/fd"), reason="/proc لازمه")
+def test_daemon_jobs_release_their_manifest(tmp_path):
+    """بعد از هر /download هیچ fdی روی .pins.sqlite (و -wal/-shm) باز نمی‌مونه"""
+    async def go():
+        async with bench.StubServer(pins=30) as srv:
+            proc, base = await start_daemon(tmp_path)
+            try:
+                async with aiohttp.ClientSession() as s:
+                    for user in ("u1", "u2", "u3"):
+                        status, events = await post(s, f"{base}/download",
+                                                    {"profile_url": f"{srv.base}/{user}"})
+                        assert status == 200 and events[-1]["ok"] == 30
+                fds = Path(f"/proc/{proc.pid}/fd")
+                return [t for fd in fds.iterdir()
+                        if main.MANIFEST_NAME in (t := os.readlink(fd))]
+            finally:
+                proc.terminate()
+                await proc.wait()
+
+    assert asyncio.run(go()) == []